@@ -0,0 +1,106 @@
+from array import array
+from ASTNode import *
+from symbols import SymbolTable
+
+NO_NODE = 0  # Index 0 is reserved, so 0 means "no child" / "no sibling"
+NO_VALUE = -1  # Value id of operator nodes, which are named by their kind
+
+
+class ASTArena:
+    # Holds every node of the AST and the standardized tree. A node is an
+    # integer index into four parallel arrays instead of an object, which
+    # keeps big trees compact and out of the garbage collector's way.
+    __slots__ = ("kinds", "values", "left", "right", "symbols")
+
+    def __init__(self, symbols=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.kinds = array("b", [0])  # Node kind code
+        self.values = array("i", [NO_VALUE])  # Symbol id of the spelling
+        self.left = array("i", [NO_NODE])  # First child
+        self.right = array("i", [NO_NODE])  # Next sibling
+
+    def __len__(self):
+        return len(self.kinds) - 1
+
+    def newNode(self, kind, value=None):
+        # value is only given for leaves; operator nodes take their kind's label
+        self.kinds.append(kind)
+        self.values.append(NO_VALUE if value is None else self.symbols.internId(value))
+        self.left.append(NO_NODE)
+        self.right.append(NO_NODE)
+        return len(self.kinds) - 1
+
+    def copyNode(self, node):
+        # Shallow copy: same kind, value and children, but no sibling
+        copy = len(self.kinds)
+        self.kinds.append(self.kinds[node])
+        self.values.append(self.values[node])
+        self.left.append(self.left[node])
+        self.right.append(NO_NODE)
+        return copy
+
+    def setKind(self, node, kind):
+        # Used by the rewrites, which only ever produce operator nodes
+        self.kinds[node] = kind
+        self.values[node] = NO_VALUE
+
+    def setLeaf(self, node, kind, value):
+        # Turn node into a leaf, keeping its sibling; used by the optimizer
+        self.kinds[node] = kind
+        self.values[node] = self.symbols.internId(value)
+        self.left[node] = NO_NODE
+
+    def overwrite(self, node, source):
+        # Make node stand for source's subtree, keeping node's own sibling
+        self.kinds[node] = self.kinds[source]
+        self.values[node] = self.values[source]
+        self.left[node] = self.left[source]
+
+    def copyTree(self, node):
+        # Deep copy of node and everything under it, but not its sibling
+        kinds = self.kinds
+        values = self.values
+        left = self.left
+        right = self.right
+        copy = self.copyNode(node)
+        pending = [(node, copy)]
+        while pending:
+            source, target = pending.pop()
+            child = left[source]
+            previous = NO_NODE
+            while child != NO_NODE:
+                childCopy = len(kinds)
+                kinds.append(kinds[child])
+                values.append(values[child])
+                left.append(NO_NODE)
+                right.append(NO_NODE)
+                if previous == NO_NODE:
+                    left[target] = childCopy
+                else:
+                    right[previous] = childCopy
+                previous = childCopy
+                pending.append((child, childCopy))
+                child = right[child]
+        return copy
+
+    def getValue(self, node):
+        value = self.values[node]
+        if value == NO_VALUE:
+            return KIND_NAMES[self.kinds[node]]
+        return self.symbols.names[value]
+
+    def toASTNode(self, node):
+        # Build a linked ASTNode copy of node and its children (not its
+        # siblings) for the CSE machine, which still works on objects
+        copy = ASTNode(self.kinds[node], self.getValue(node))
+        child = self.left[node]
+        tail = None
+        while child != NO_NODE:
+            childCopy = self.toASTNode(child)
+            if tail is None:
+                copy.left = childCopy
+            else:
+                tail.right = childCopy
+            tail = childCopy
+            child = self.right[child]
+        return copy
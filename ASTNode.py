@@ -1,24 +1,34 @@
-class ASTNode:
-    def __init__(self, value, type):
-        self.left = None
-        self.right = None
-        self.token = None
-        self.type = type 
-        self.value = value
-        self.indentation = 0
+# Node kind codes. Leaves come first, then the AST and standardized tree
+# operators.
+(
+    ID, INT, STR, TRUE, FALSE, NIL, DUMMY,
+    LET, LAMBDA, WHERE, WITHIN, AND, REC, EQUAL, FCN_FORM, COMMA, EMPTY,
+    TAU, AUG, COND, OR, AMP, NOT, GR, GE, LS, LE, EQ, NE,
+    PLUS, MINUS, NEG, MULT, DIV, POW, AT, GAMMA, YSTAR,
+) = range(38)
 
-    def createNode(self, value, type):
-        t = ASTNode(value, type)
-        return t
+# Label of each kind, as printed by -ast
+KIND_NAMES = (
+    "ID", "INT", "STR", "true", "false", "nil", "dummy",
+    "let", "lambda", "where", "within", "and", "rec", "=", "fcn_form", ",", "()",
+    "tau", "aug", "->", "or", "&", "not", "gr", "ge", "ls", "le", "eq", "ne",
+    "+", "-", "neg", "*", "/", "**", "@", "gamma", "YSTAR",
+)
 
-    def setType(self, type):
-        self.type = type
+LITERAL_KINDS = frozenset((ID, INT, STR))  # Printed as <KIND:value>
+CONSTANT_KINDS = frozenset((TRUE, FALSE, NIL, DUMMY))  # Printed as <value>
+BINARY_OPERATORS = frozenset((OR, AMP, GR, GE, LS, LE, EQ, NE, PLUS, MINUS, MULT, DIV, POW))
 
-    def setVal(self, value):
-        self.value = value
+
+class ASTNode:
+    __slots__ = ("kind", "value", "left", "right")
+
+    def __init__(self, kind, value=None):
+        self.left = None
+        self.right = None
+        self.kind = kind
+        # Operator nodes carry their label; leaves carry the interned spelling
+        self.value = KIND_NAMES[kind] if value is None else value
 
     def getVal(self):
         return self.value
-
-    def getType(self):
-        return self.type
\ No newline at end of file
@@ -1,54 +1,149 @@
-from ASTNode import ASTNode
+import sys
+from ASTArena import *
+from scanner import *
+
+# Lines the -ast printer collects before writing them out in one go
+PRINT_CHUNK_LINES = 8192
+
+# How -ast prints each kind: literals as <KIND:value>, constants as <value>
+AST_LABELS = tuple(
+    "<" + name + ":" if kind in LITERAL_KINDS
+    else "<" + name + ">" if kind in CONSTANT_KINDS
+    else name
+    for kind, name in enumerate(KIND_NAMES)
+)
+
+# Tokens that can begin an Rn, so also continue an application
+RN_START = frozenset((
+    T_IDENTIFIER, T_INTEGER, T_STRING,
+    T_TRUE, T_FALSE, T_NIL, T_LPAREN, T_DUMMY,
+))
+
+# Binding strength of the expression levels, loosest first. Everything from
+# T down to R is parsed by precedence climbing over these levels instead of
+# by one method per grammar rule.
+(
+    PREC_TAU,      # T  -> Ta ( ',' Ta )+
+    PREC_AUG,      # Ta -> Ta 'aug' Tc
+    PREC_COND,     # Tc -> B '->' Tc '|' Tc
+    PREC_OR,       # B  -> B 'or' Bt
+    PREC_AMP,      # Bt -> Bt '&' Bs
+    PREC_NOT,      # Bs -> 'not' Bp
+    PREC_COMPARE,  # Bp -> A ( 'gr' | 'ge' | 'ls' | 'le' | 'eq' | 'ne' ) A
+    PREC_ADD,      # A  -> A ( '+' | '-' ) At | ( '+' | '-' ) At
+    PREC_MULT,     # At -> At ( '*' | '/' ) Af
+    PREC_POW,      # Af -> Ap '**' Af
+    PREC_AT,       # Ap -> Ap '@' '<IDENTIFIER>' R
+    PREC_GAMMA,    # R  -> R Rn
+) = range(12)
+
+# Tokens that are a whole Rn by themselves and the leaf node they become
+LEAF_TOKENS = {
+    T_IDENTIFIER: ID, T_INTEGER: INT, T_STRING: STR,
+    T_TRUE: TRUE, T_FALSE: FALSE, T_NIL: NIL, T_DUMMY: DUMMY,
+}
+
+# Binary operator tokens and the (level, node kind) they build
+BINARY_TOKENS = {
+    T_AUG: (PREC_AUG, AUG),
+    T_OR: (PREC_OR, OR),
+    T_AMPERSAND: (PREC_AMP, AMP),
+    T_GR: (PREC_COMPARE, GR), T_GREATER: (PREC_COMPARE, GR),
+    T_GE: (PREC_COMPARE, GE), T_GREATER_EQ: (PREC_COMPARE, GE),
+    T_LS: (PREC_COMPARE, LS), T_LESS: (PREC_COMPARE, LS),
+    T_LE: (PREC_COMPARE, LE), T_LESS_EQ: (PREC_COMPARE, LE),
+    T_EQ: (PREC_COMPARE, EQ),
+    T_NE: (PREC_COMPARE, NE),
+    T_PLUS: (PREC_ADD, PLUS), T_MINUS: (PREC_ADD, MINUS),
+    T_STAR: (PREC_MULT, MULT), T_SLASH: (PREC_MULT, DIV),
+    T_POWER: (PREC_POW, POW),
+}
+
+# Operator stack entry for a '->' still waiting for its '|'
+THEN = -1
+
+# Pending work on the parser's explicit stack. Each entry says what to do
+# once everything pushed above it has been parsed.
+(
+    PARSE_E, EXPECT_IN, EXPECT_WHERE, BUILD, CLOSE_PAREN,
+    PARSE_D, EXPECT_WITHIN, PARSE_DA, EXPECT_AND, PARSE_DB, CLOSE_DB,
+) = range(11)
+
 
 class ASTParser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, symbols=None):
+        # tokens may be a list or the scanner's generator; they are pulled
+        # one at a time so the whole token list never has to be held
+        self.tokens = iter(tokens)
+        self.endToken = Token(T_END, "")  # Returned once the tokens run out
         self.current_token = None
-        self.index = 0  # This is to track the current reading position
-        self.stack = []
+        self.arena = ASTArena(symbols)  # Every node the parser builds
+        self.stack = []  # Indices of finished subtrees in the arena
         self.prevToken = None
         self.errorExist = False
 
-    def read(self, value, type):
-
-        self.current_token = self.tokens[self.index]
-
-        if self.current_token.value != value and value != "UserDefined":
-            print("Expected", self.current_token.value, "but got ", value)
+    def read(self, kind=None):
+        # kind None accepts any token (a user defined name or literal)
+        if kind is not None and self.current_token.kind != kind:
+            print("Expected", self.current_token.value, "but got ", TOKEN_NAMES[kind])
             self.errorExist = True
             return
 
         # Pick the next token
         self.prevToken = self.current_token
-        self.index += 1
-        if self.index < len(self.tokens):
-            self.current_token = self.tokens[self.index]
-        else:
-            self.current_token.value = self.prevToken.value
-            self.current_token.type = ""
-
-    def preOrderTraversal(self, node, depth=0):
-        if node is not None:
-            if node.type in ["ID", "STR", "INT"]:
-                print("." * depth + "<" + node.type + ":" + node.value + ">")
-            elif node.type in ["BOOL", "NIL", "DUMMY"]:
-                print("." * depth + "<" + node.value + ">")
-            else:
-                print("." * depth + node.value)  # Prepend dots based on depth
-            self.preOrderTraversal(
-                node.left, depth + 1
-            )  # Visit the left child with increased depth
-            self.preOrderTraversal(
-                node.right, depth
-            )  # Visit the right right with the same depth
-
-    def startParsing(self, astFlag):
-        self.current_token = self.tokens[0]
-        self.E()
+        self.current_token = next(self.tokens, self.endToken)
+
+    def preOrderTraversal(self, node, out=None):
+        # Print the tree one line per node, children indented one dot more
+        # than their parent. Walks with an explicit stack of the siblings
+        # still to visit, and writes to out in large chunks.
+        if out is None:
+            out = sys.stdout
+        arena = self.arena
+        kinds = arena.kinds
+        values = arena.values
+        left = arena.left
+        right = arena.right
+        names = arena.symbols.names
+
+        labels = AST_LABELS
+        dots = [""]  # dots[depth] is the indent for that depth
+        lines = []
+        pending = [(node, 0)]
+        while pending:
+            node, depth = pending.pop()
+            while node != NO_NODE:
+                if depth == len(dots):
+                    dots.append(dots[-1] + ".")
+                kind = kinds[node]
+                if kind in LITERAL_KINDS:
+                    lines.append(dots[depth] + labels[kind] + names[values[node]] + ">")
+                else:
+                    lines.append(dots[depth] + labels[kind])
+
+                if len(lines) >= PRINT_CHUNK_LINES:
+                    out.write("\n".join(lines))
+                    out.write("\n")
+                    lines.clear()
+
+                # The sibling comes after this node's whole subtree
+                if right[node] != NO_NODE:
+                    pending.append((right[node], depth))
+                node = left[node]
+                depth += 1
+
+        if lines:
+            out.write("\n".join(lines))
+            out.write("\n")
+        out.flush()
+
+    def startParsing(self, astFlag, out=None):
+        self.current_token = next(self.tokens, self.endToken)
+        self.parse()
         if self.errorExist:
             print("There is an error in parsing")
         elif astFlag == "-ast":
-            self.preOrderTraversal(self.stack[0])
+            self.preOrderTraversal(self.stack[0], out)
         elif astFlag == "":
             pass
         else:
@@ -58,378 +153,330 @@ class ASTParser:
     def isAnError(self):
         return self.errorExist
 
-    def buildTree(self, token, type, numOfChilds):
-        # pass the transduction grammar value as the token
-        parentNode = ASTNode(token, type)
-        head = None
-        for i in range(numOfChilds):
-            if len(self.stack) != 0:
-
-                # If the grammar rules are correct the if statement is optional
-
-                child = self.stack.pop()
-                child.right = head
-                head = child
-            else:
-                print("There is an error in code")
-                self.errorExist = True
-        parentNode.left = head
-        self.stack.append(parentNode)
+    def buildTree(self, kind, numOfChilds, value=None):
+        # value is only given for leaves; operator nodes take their kind's label
+        parentNode = self.arena.newNode(kind, value)
+        stack = self.stack
+        if len(stack) < numOfChilds:
+            # If the grammar rules are correct this never happens
+            print("There is an error in code")
+            self.errorExist = True
+            numOfChilds = len(stack)
+        if numOfChilds:
+            children = stack[-numOfChilds:]
+            del stack[-numOfChilds:]
+            # Link the children left to right as first child / next sibling
+            right = self.arena.right
+            for k in range(len(children) - 1):
+                right[children[k]] = children[k + 1]
+            self.arena.left[parentNode] = children[0]
+        stack.append(parentNode)
+
+    def error(self, *message):
+        print(*message)
+        self.errorExist = True
 
     # Parsing Table
 
-    def E(self):
-        # E -> 'let' D 'in     E => 'let'
-        if self.current_token.value == "let":
-            self.read("let", "<KEYWORD>")
-            self.D()
-
-            if self.current_token.value != "in":
-                print("Error: expected in")
-                self.errorExist = True
-                return
-
-            self.read("in", "<KEYWORD>")
-            self.E()
-            self.buildTree("let", "KEYWORD", 2)
-
-        # E -> 'fn' Vb+ '.' E => 'lambda'
-        elif self.current_token.value == "fn":
-            self.read("fn", "<KEYWORD>")
-            self.Vb()
-            n = 1
-            while self.current_token.value in ["<IDENTIFIER>", "("]:
-                self.Vb()
-                n += 1
-            if self.current_token.value != ".":
-                print("Error: expected .")
-                self.errorExist = True
-                return
-            self.read(".", "<OPERATOR>")
-            self.E()
-            self.buildTree("lambda", "KEYWORD", n + 1)
-
-        # E -> Ew
-        else:
-            self.Ew()
-
-    def Ew(self):
-        self.T()  # E -> T
-        # Ew -> T 'where' Dr => 'where'
-        if self.current_token.value == "where":
-
-            self.read("where", "<KEYWORD>")
-            self.Dr()
-            self.buildTree("where", "KEYWORD", 2)
-
-    def T(self):
-        self.Ta()  # E -> Ta
-        # T -> Ta ( ',' Ta )+ => 'tau'
-        if self.current_token.value == ",":
-            self.read(",", ",")
-            self.Ta()
-            n = 1  # track the number pf repitition
-            while self.current_token.value == ",":
-                n += 1
-                self.read(",", ",")
-                self.Ta()
-            self.buildTree("tau", "KEYWORD", n + 1)
-
-    def Ta(self):
-        self.Tc()  # E -> Tc
-        # Ta -> Ta 'aug' Tc => 'aug'
-        while self.current_token.value == "aug":
-            self.read("aug", "<KEYWORD>")
-            self.Tc()
-            self.buildTree("aug", "KEYWORD", 2)
-
-    def Tc(self):
-        self.B()  # E -> B
-        # Tc -> B '->' Tc '|' Tc => '->'
-        if self.current_token.value == "->":
-            self.read("->", "<OPERATOR>")
-            self.Tc()
-            if self.current_token.value != "|":
-                print("Error: expected |")
-                self.errorExist = True
-                return
-            self.read("|", "<OPERATOR>")
-            self.Tc()
-            self.buildTree("->", "KEYWORD", 3)
-
-    def B(self):
-        self.Bt()  # E -> Bt
-        # B ->B'or' Bt => 'or'
-        while self.current_token.value == "or":
-            self.read("or", "<OPERATOR>")
-            self.Bt()
-            self.buildTree("or", "KEYWORD", 2)
-
-    def Bt(self):
-        self.Bs()  # E -> Bs
-        # Bt -> Bt '&' Bs => '&'
-        while self.current_token.value == "&":
-            self.read("&", "<OPERATOR>")
-            self.Bs()
-            self.buildTree("&", "KEYWORD", 2)
-
-    def Bs(self):
-        # Bs -> 'not' Bp => 'not'
-        if self.current_token.value == "not":
-            self.read("not", "<OPERATOR>")
-            self.Bp()
-            self.buildTree("not", "KEYWORD", 1)
-        else:
-            # E -> Bp
-            self.Bp()
-
-    def Bp(self):
-        self.A()  # E -> A
-        # Bp -> A ('gr' | '>' ) A => 'gr'
-        if self.current_token.value in ["gr", ">"]:
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("gr", "KEYWORD", 2)
-        # Bp -> A ('ge' | '>=') A => 'ge'
-        elif self.current_token.value in ["ge", ">="]:
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("ge", "KEYWORD", 2)
-        # Bp -> A ('ls' | '<' ) A => 'ls'
-        elif self.current_token.value in ["ls", "<"]:
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("ls", "KEYWORD", 2)
-        # Bp -> A ('le' | '<=') A => 'le'
-        elif self.current_token.value in ["le", "<="]:
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("le", "KEYWORD", 2)
-        # Bp -> A 'eq' A => 'eq'
-        elif self.current_token.value == "eq":
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("eq", "KEYWORD", 2)
-        # Bp -> A 'ne' A => 'ne'
-        elif self.current_token.value == "ne":
-            self.read(self.current_token.value, "<OPERATOR>")
-            self.A()
-            self.buildTree("ne", "KEYWORD", 2)
-
-    def A(self):
-        # A -> '+' At
-        if self.current_token.value == "+":
-            self.read("+", "<OPERATOR>")
-            self.At()
-        # A -> '-' At => 'neg'
-        elif self.current_token.value == "-":
-            self.read("-", "<OPERATOR>")
-            self.At()
-            self.buildTree("neg", "KEYWORD", 1)
-        else:
-            self.At()  # A -> At
-            while self.current_token.value in ["+", "-"]:
-                # A ->A'+' At => '+'
-                if self.current_token.value == "+":
-                    self.read("+", "<OPERATOR>")
-                    self.At()
-                    self.buildTree("+", "OPERATOR", 2)
-                # A -> A '-' At => '-'
-                elif self.current_token.value == "-":
-                    self.read("-", "<OPERATOR>")
-                    self.At()
-                    self.buildTree("-", "OPERATOR", 2)
-
-    def At(self):
-        self.Af()  # A -> Af
-        while self.current_token.value in ["*", "/"]:
-            # At -> At '*' Af => '*'
-            if self.current_token.value == "*":
-                self.read("*", "<OPERATOR>")
-                self.Af()
-                self.buildTree("*", "OPERATOR", 2)
-            # At -> At '/' Af => '/'
-            elif self.current_token.value == "/":
-                self.read("/", "<OPERATOR>")
-                self.Af()
-                self.buildTree("/", "OPERATOR", 2)
-
-    def Af(self):
-        self.Ap()  # Af -> Ap
-        # Af -> Ap '**' Af => '**'
-        if self.current_token.value == "**":
-            self.read("**", "<OPERATOR>")
-            self.Af()
-            self.buildTree("**", "KEYWORD", 2)
-
-    def Ap(self):
-        self.R()  # Ap -> R
-        # Ap -> Ap '@' '<IDENTIFIER>' R => '@'
-        while self.current_token.value == "@":
-            self.read("@", "<OPERATOR>")
-            self.read("UserDefined", "<IDENTIFIER>")
-            self.buildTree(self.prevToken.value, "ID", 0)
-            self.R()
-            # self.buildTree("@", 2)
-            self.buildTree("@", "KEYWORD", 3)
-
-    # Check this function
-    def R(self):
-        self.Rn()  # R -> Rn
-        # R ->R Rn => 'gamma'
-        while self.current_token.type in [
-            "<IDENTIFIER>",
-            "<INTEGER>",
-            "<STRING>",
-        ] or self.current_token.value in [
-            "true",
-            "false",
-            "nil",
-            "(",
-            "dummy",
-        ]:
-            self.Rn()
-            self.buildTree("gamma", "KEYWORD", 2)
-
-    def Rn(self):
-        # Rn -> '<IDENTIFIER>'
-        if self.current_token.type == "<IDENTIFIER>":
-            self.read("UserDefined", "<IDENTIFIER>")
-            self.buildTree(self.prevToken.value, "ID", 0)
-
-        # Rn -> '<INTEGER>'
-        elif self.current_token.type == "<INTEGER>":
-            self.read("UserDefined", "<INTEGER>")
-            self.buildTree(self.prevToken.value, "INT", 0)
-        # Rn -> '<STRING>'
-        elif self.current_token.type == "<STRING>":
-            self.read("UserDefined", "<STRING>")
-            self.buildTree(self.prevToken.value, "STR", 0)
-        # Rn -> 'true' => 'true'
-        elif self.current_token.value == "true":
-            self.read("true", "<KEYWORD>")
-            self.buildTree("true", "BOOL", 0)
-        # Rn -> 'false' => 'false'
-        elif self.current_token.value == "false":
-            self.read("false", "<KEYWORD>")
-            self.buildTree("false", "BOOL", 0)
-        # Rn -> 'nil' => 'nil'
-        elif self.current_token.value == "nil":
-            self.read("nil", "<KEYWORD>")
-            self.buildTree("nil", "NIL", 0)
-        # Rn -> '(' E ')'
-        elif self.current_token.value == "(":
-            self.read("(", "(")
-            self.E()
-            if self.current_token.value != ")":
-                print("Error: expected )")
-                self.errorExist = True
-                return
-            self.read(")", ")")
-        # Rn -> 'dummy' => 'dummy'
-        elif self.current_token.value == "dummy":
-            self.read("dummy", "<KEYWORD>")
-            self.buildTree("dummy", "DUMMY", 0)
-
-    def D(self):
-        self.Da()  # D -> Da
-        # D -> Da 'within' D => 'within'
-        while self.current_token.value == "within":
-            self.read("within", "<KEYWORD>")
-            self.D()
-            self.buildTree("within", "KEYWORD", 2)
-
-    def Da(self):
-        self.Dr()  # Da -> Dr
-        n = 0  # keep track of repitation of Dr
-        # Da -> Dr ( 'and' Dr )+ => 'and'
-        while self.current_token.value == "and":
-            self.read("and", "<KEYWORD>")
-            self.Dr()
-            n += 1
-        if n > 0:
-            self.buildTree("and", "KEYWORD", n + 1)
-
-    def Dr(self):
-        # Dr -> 'rec' Db => 'rec'
-        if self.current_token.value == "rec":
-            self.read("rec", "<KEYWORD>")
-            self.Db()
-            self.buildTree("rec", "KEYWORD", 1)
-        else:
-            # Dr -> Db
-            self.Db()
-
-    def Db(self):
-        # Db -> '(' D ')'
-        if self.current_token.value == "(":
-            self.read("(", "(")
-            self.D()
-            if self.current_token.value != ")":
-                print("Error: expected )")
-                self.errorExist = True
-                return
-            self.read(")", ")")
-        n = 0
-        if self.current_token.type == "<IDENTIFIER>":
-            # Db -> Vl '=' E => '='
-            self.Vl()
-
-            if self.current_token.value == "=":
-                self.read("=", "<OPERATOR>")
-                self.E()
-                self.buildTree("=", "KEYWORD", 2)
-            else:
-                # Db-> '<IDENTIFIER>' Vb+ '=' E => 'fcn_form'
-                self.Vb()
-                n = 1
-                while self.current_token.type in ["<IDENTIFIER>", "("]:
+    def parse(self):
+        # Nested constructs push their continuation onto todo instead of
+        # recursing, so nesting depth is limited only by memory
+        todo = [(PARSE_E, None)]
+        while todo and not self.errorExist:
+            task, arg = todo.pop()
+            kind = self.current_token.kind
+
+            if task == PARSE_E:
+                # E -> 'let' D 'in' E => 'let'
+                if kind == T_LET:
+                    self.read(T_LET)
+                    todo.append((EXPECT_IN, None))
+                    todo.append((PARSE_D, None))
+
+                # E -> 'fn' Vb+ '.' E => 'lambda'
+                elif kind == T_FN:
+                    self.read(T_FN)
                     self.Vb()
-                    n += 1
-                if self.current_token.value != "=":
-                    print("Error: expected in")
-                    self.errorExist = True
+                    n = 1
+                    while self.current_token.kind in (T_IDENTIFIER, T_LPAREN):
+                        self.Vb()
+                        n += 1
+                    if self.current_token.kind != T_DOT:
+                        self.error("Error: expected .")
+                        return
+                    self.read(T_DOT)
+                    todo.append((BUILD, (LAMBDA, n + 1)))
+                    todo.append((PARSE_E, None))
+
+                # E -> Ew
+                else:
+                    todo.append((EXPECT_WHERE, None))
+                    self.expression([], False, todo)
+
+            elif task == EXPECT_IN:
+                if kind != T_IN:
+                    self.error("Error: expected in")
+                    return
+                self.read(T_IN)
+                todo.append((BUILD, (LET, 2)))
+                todo.append((PARSE_E, None))
+
+            elif task == EXPECT_WHERE:
+                # Ew -> T 'where' Dr => 'where'
+                if kind == T_WHERE:
+                    self.read(T_WHERE)
+                    todo.append((BUILD, (WHERE, 2)))
+                    todo.append((PARSE_DB, True))
+
+            elif task == BUILD:
+                self.buildTree(*arg)
+
+            elif task == CLOSE_PAREN:
+                # Rn -> '(' E ')', then carry on with the enclosing expression
+                if kind != T_RPAREN:
+                    self.error("Error: expected )")
                     return
-                self.read("=", "<OPERATOR>")
-                self.E()
-                self.buildTree("fcn_form", "KEYWORD", n + 2)
+                self.read(T_RPAREN)
+                self.expression(arg, True, todo)
+
+            elif task == PARSE_D:
+                # D -> Da 'within' D => 'within'
+                todo.append((EXPECT_WITHIN, None))
+                todo.append((PARSE_DA, None))
+
+            elif task == EXPECT_WITHIN:
+                if kind == T_WITHIN:
+                    self.read(T_WITHIN)
+                    todo.append((BUILD, (WITHIN, 2)))
+                    todo.append((PARSE_D, None))
+
+            elif task == PARSE_DA:
+                # Da -> Dr ( 'and' Dr )+ => 'and'
+                todo.append((EXPECT_AND, 1))
+                todo.append((PARSE_DB, True))
+
+            elif task == EXPECT_AND:
+                if kind == T_AND:
+                    self.read(T_AND)
+                    todo.append((EXPECT_AND, arg + 1))
+                    todo.append((PARSE_DB, True))
+                elif arg > 1:
+                    self.buildTree(AND, arg)
+
+            elif task == PARSE_DB:
+                # Dr -> 'rec' Db => 'rec'   (arg says whether rec may appear)
+                if arg and kind == T_REC:
+                    self.read(T_REC)
+                    todo.append((BUILD, (REC, 1)))
+                    todo.append((PARSE_DB, False))
+
+                # Db -> '(' D ')'
+                elif kind == T_LPAREN:
+                    self.read(T_LPAREN)
+                    todo.append((CLOSE_DB, None))
+                    todo.append((PARSE_D, None))
+
+                elif kind == T_IDENTIFIER:
+                    # Db -> Vl '=' E => '='
+                    self.Vl()
+
+                    if self.current_token.kind == T_EQUALS:
+                        self.read(T_EQUALS)
+                        todo.append((BUILD, (EQUAL, 2)))
+                        todo.append((PARSE_E, None))
+                    else:
+                        # Db-> '<IDENTIFIER>' Vb+ '=' E => 'fcn_form'
+                        self.Vb()
+                        n = 1
+                        while self.current_token.kind in (T_IDENTIFIER, T_LPAREN):
+                            self.Vb()
+                            n += 1
+                        if self.current_token.kind != T_EQUALS:
+                            self.error("Error: expected =")
+                            return
+                        self.read(T_EQUALS)
+                        todo.append((BUILD, (FCN_FORM, n + 2)))
+                        todo.append((PARSE_E, None))
+
+                else:
+                    self.error("Error: expected a definition")
+                    return
+
+            elif task == CLOSE_DB:
+                if kind != T_RPAREN:
+                    self.error("Error: expected )")
+                    return
+                self.read(T_RPAREN)
+
+    def expression(self, ops, haveOperand, todo):
+        # Precedence climbing over T .. Rn. ops holds (level, node kind,
+        # number of children) for every operator whose right operand is not
+        # finished yet; an entry is built once a looser operator arrives.
+        # Returns early, leaving a CLOSE_PAREN task, when it meets '(' E ')'.
+        while not self.errorExist:
+            token = self.current_token
+            kind = token.kind
+
+            if not haveOperand:
+                top = ops[-1][0] if ops else -1
+
+                # Rn -> '<IDENTIFIER>' | '<INTEGER>' | '<STRING>'
+                #       | 'true' | 'false' | 'nil' | 'dummy'
+                leaf = LEAF_TOKENS.get(kind)
+                if leaf is not None:
+                    self.read()
+                    self.buildTree(leaf, 0, token.value if leaf in LITERAL_KINDS else None)
+                # Rn -> '(' E ')'
+                elif kind == T_LPAREN:
+                    self.read()
+                    todo.append((CLOSE_PAREN, ops))
+                    todo.append((PARSE_E, None))
+                    return
+                # Bs -> 'not' Bp => 'not'
+                elif kind == T_NOT and top < PREC_NOT:
+                    self.read()
+                    ops.append((PREC_NOT, NOT, 1))
+                    continue
+                # A -> '-' At => 'neg'
+                elif kind == T_MINUS and top < PREC_ADD:
+                    self.read()
+                    ops.append((PREC_ADD, NEG, 1))
+                    continue
+                # A -> '+' At
+                elif kind == T_PLUS and top < PREC_ADD:
+                    self.read()
+                    continue
+                else:
+                    self.error("Error: unexpected", token.value or "end of input")
+                    return
+                haveOperand = True
+                continue
+
+            # R -> R Rn => 'gamma'
+            if kind in RN_START:
+                self.reduce(ops, PREC_GAMMA)
+                ops.append((PREC_GAMMA, GAMMA, 2))
+                haveOperand = False
+                continue
+
+            # Ap -> Ap '@' '<IDENTIFIER>' R => '@'
+            if kind == T_AT:
+                self.reduce(ops, PREC_AT)
+                self.read()
+                if self.current_token.kind != T_IDENTIFIER:
+                    self.error("Error: expected an identifier after @")
+                    return
+                self.read()
+                self.buildTree(ID, 0, self.prevToken.value)
+                ops.append((PREC_AT, AT, 3))
+                haveOperand = False
+                continue
+
+            # T -> Ta ( ',' Ta )+ => 'tau'
+            if kind == T_COMMA:
+                if not self.reduce(ops, PREC_TAU + 1):
+                    return
+                self.read()
+                if ops and ops[-1][1] == TAU:
+                    ops[-1] = (PREC_TAU, TAU, ops[-1][2] + 1)
+                else:
+                    ops.append((PREC_TAU, TAU, 2))
+                haveOperand = False
+                continue
+
+            # Tc -> B '->' Tc '|' Tc => '->'
+            if kind == T_ARROW:
+                self.reduce(ops, PREC_COND + 1)
+                self.read()
+                ops.append((PREC_COND, THEN, 0))
+                haveOperand = False
+                continue
+
+            if kind == T_BAR:
+                # A '|' closes every finished conditional above the '->'
+                # it belongs to, as in B '->' (B '->' Tc '|' Tc) '|' Tc
+                self.reduce(ops, PREC_COND + 1)
+                while ops and ops[-1][1] == COND:
+                    ops.pop()
+                    self.buildTree(COND, 3)
+                if ops and ops[-1][1] == THEN:
+                    self.read()
+                    ops[-1] = (PREC_COND, COND, 3)
+                    haveOperand = False
+                    continue
+                break
+
+            binary = BINARY_TOKENS.get(kind)
+            if binary is None:
+                break
+            level = binary[0]
+            if level == PREC_COMPARE:
+                # Bp allows a single comparison, so a second one ends E
+                self.reduce(ops, PREC_COMPARE + 1)
+                if ops and ops[-1][0] == PREC_COMPARE:
+                    break
+            if not self.reduce(ops, level):
+                return
+            self.read()
+            ops.append((level, binary[1], 2))
+            haveOperand = False
+
+        # The expression ends here; build everything still pending
+        if not self.errorExist:
+            self.reduce(ops, PREC_TAU)
+
+    def reduce(self, ops, level):
+        # Build every pending operator that binds at least as tightly as
+        # level. '**' and the else branch of '->' associate to the right, so
+        # an operator of their own level does not build them.
+        while ops:
+            prec, kind, numOfChilds = ops[-1]
+            if kind == THEN:
+                if level < PREC_COND:
+                    # An 'aug', ',' or the end of E inside B '->' Tc
+                    self.error("Error: expected |")
+                    return False
+                return True
+            if prec < level or (prec == level and (level == PREC_POW or level == PREC_COND)):
+                return True
+            ops.pop()
+            self.buildTree(kind, numOfChilds)
+        return True
 
     def Vb(self):
         # Vb -> '<IDENTIFIER>'
-        if self.current_token.type == "<IDENTIFIER>":
-            self.read("UserDefined", "<IDENTIFIER>")
-            self.buildTree(self.prevToken.value, "ID", 0)
+        if self.current_token.kind == T_IDENTIFIER:
+            self.read()
+            self.buildTree(ID, 0, self.prevToken.value)
 
-        elif self.current_token.value == "(":
-            self.read("(", "(")
+        elif self.current_token.kind == T_LPAREN:
+            self.read(T_LPAREN)
             # Vb -> '(' Vl ')'
-            if self.current_token.type == "<IDENTIFIER>":
+            if self.current_token.kind == T_IDENTIFIER:
                 self.Vl()
-                if self.current_token.value != ")":
-                    print("Error: expected in")
-                    self.errorExist = True
+                if self.current_token.kind != T_RPAREN:
+                    self.error("Error: expected )")
                     return
-                self.read(")", ")")
+                self.read(T_RPAREN)
             # Vb -> '(' ')'
             else:
-                if self.current_token.value != ")":
-                    print("Error: expected in")
-                    self.errorExist = True
+                if self.current_token.kind != T_RPAREN:
+                    self.error("Error: expected )")
                     return
-                self.read(")", ")")
-                self.buildTree("()", "KEYWORD", 0)
+                self.read(T_RPAREN)
+                self.buildTree(EMPTY, 0)
 
     def Vl(self):
         # Vl -> '<IDENTIFIER>' list ',' => ','?
-        if self.current_token.type == "<IDENTIFIER>":
-            self.read("UserDefined", "<IDENTIFIER>")
-            self.buildTree(self.prevToken.value, "ID", 0)
+        if self.current_token.kind == T_IDENTIFIER:
+            self.read()
+            self.buildTree(ID, 0, self.prevToken.value)
 
             n = 0
-            while self.current_token.value == ",":
-                self.read(",", ",")
-                self.read("UserDefined", "<IDENTIFIER>")
-                self.buildTree(self.prevToken.value, "ID", 0)
+            while self.current_token.kind == T_COMMA:
+                self.read(T_COMMA)
+                self.read()
+                self.buildTree(ID, 0, self.prevToken.value)
                 n += 1
             if n > 0:
-                self.buildTree(",", "KEYWORD", n + 1)
+                self.buildTree(COMMA, n + 1)
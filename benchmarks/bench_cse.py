@@ -0,0 +1,131 @@
+# CSE machine benchmark
+# Usage: python3 benchmarks/bench_cse.py [size]
+#
+# Compiles recursive programs in the style of tests/test_factorial.rpal
+# and reports how many instructions the CSE machine runs per second. The
+# programs leave their result on the stack instead of printing it.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scanner import RPAL_Scanner
+from ASTParser import ASTParser
+from standardizer import standardizer
+from codegen import ControlStructureGenerator
+from optimizer import optimize
+from cse_machine import CSEMachine
+
+
+def factorials(size):
+    # Fact 10, size times over
+    return (
+        "let rec Fact n = n eq 1 -> 1 | n * Fact (n - 1) in "
+        "let rec Loop k = k eq 0 -> 0 | Fact 10 + Loop (k - 1) in "
+        "Loop %d" % size
+    )
+
+
+def accumulator(size):
+    # A two-argument recursion that carries its result along
+    return "let rec Sum n a = n eq 0 -> a | Sum (n - 1) (a + n) in Sum %d 0" % (size * 10)
+
+
+def arithmetic(size):
+    # Several integer operations and comparisons per call
+    return (
+        "let rec Poly n a = n eq 0 -> a | "
+        "Poly (n - 1) ((a + n * n - n / 2) gr 1000000 -> 0 | a + n * n - n / 2) in "
+        "Poly %d 0" % (size * 10)
+    )
+
+
+def tuples(size):
+    # Recursion that selects from and builds tuples on every call
+    return (
+        "let rec Step p = p 1 eq 0 -> p 2 | Step (p 1 - 1, p 2 + p 1) in "
+        "Step (%d, 0)" % (size * 10)
+    )
+
+
+def tupleSum(size):
+    # The README's Psum idiom over a literal tuple: one selection per call
+    values = ", ".join(str(i) for i in range(size * 10))
+    return (
+        "let Sum A = Psum (A, Order A) "
+        "where rec Psum (T, N) = N eq 0 -> 0 | Psum (T, N - 1) + T N in "
+        "Sum (%s)" % values
+    )
+
+
+def augLoop(size):
+    # Grows a tuple one element at a time with aug (100k elements at the
+    # default size)
+    return (
+        "let rec Build n t = n eq 0 -> t | Build (n - 1) (t aug n) in "
+        "Order (Build %d nil)" % (size * 500)
+    )
+
+
+def stringWalk(size):
+    # Builds a string one Conc at a time, then walks it with Stem and
+    # Stern (100k characters at the default size)
+    return (
+        "let rec Build n s = n eq 0 -> s | Build (n - 1) (Conc s 'x') in "
+        "let rec Len s n = s eq '' -> n | Len (Stern s) (n + Order (Stem s, s)) in "
+        "Len (Build %d '') 0" % (size * 500)
+    )
+
+
+def wideScope(size):
+    # Recursion that reads variables bound by a 32-name tuple definition
+    names = ", ".join("v%d" % i for i in range(32))
+    values = ", ".join(str(i) for i in range(32))
+    return (
+        "let %s = %s in "
+        "let rec Sum n a = n eq 0 -> a | Sum (n - 1) (a + v31 + v0) in "
+        "Sum %d 0" % (names, values, size * 10)
+    )
+
+
+PROGRAMS = [
+    ("factorial", factorials),
+    ("accumulator", accumulator),
+    ("arithmetic", arithmetic),
+    ("tuples", tuples),
+    ("tuple sum", tupleSum),
+    ("aug loop", augLoop),
+    ("string walk", stringWalk),
+    ("wide scope", wideScope),
+]
+
+
+def compile(source):
+    parser = ASTParser(RPAL_Scanner(None).generateTokens(source))
+    parser.startParsing("")
+    root = parser.stack[0]
+    standardizer(parser.arena).makeST(root)
+    optimize(parser.arena, root)
+    return ControlStructureGenerator(parser.arena).generate(root)
+
+
+def bench(name, source):
+    machine = CSEMachine(compile(source))
+    start = time.perf_counter()
+    machine.run()
+    elapsed = time.perf_counter() - start
+    print("%-22s %9d steps %8.3f s %12.0f steps/s %8.3f us/step"
+          % (name, machine.steps, elapsed, machine.steps / elapsed,
+             elapsed / machine.steps * 1e6))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for name, generate in PROGRAMS:
+        bench(name, generate(size))
+
+
+if __name__ == "__main__":
+    main()
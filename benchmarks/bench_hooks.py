@@ -0,0 +1,126 @@
+# Observer hook benchmark
+# Usage: python3 benchmarks/bench_hooks.py [size] [repeats] [--against rev]
+#
+# Runs the programs of bench_cse.py three ways, best of a few runs each:
+# on the CSE machine of git revision `rev`, by default the one before
+# observer.py was added, on this tree's machine without an observer, and
+# on this tree's machine with an Observer whose hooks do nothing. The
+# first ratio shows whether the hook API slowed down the machine that has
+# no observer; the second what installing one costs on top of that.
+#
+# Each tree is timed in a child process of its own, as the two trees'
+# modules have the same names. The older tree is extracted with git
+# archive into a temporary directory, so this needs a git checkout.
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+ROUNDS = 3
+
+
+def timeTree(root, observed, size, repeats):
+    # Child process: the fastest run of each program on the machine in
+    # `root`, in seconds, and the steps of one run, as a JSON list
+    sys.path[:] = [path for path in sys.path if os.path.abspath(path or ".") != HERE]
+    sys.path[0:0] = [os.path.join(root, "benchmarks"), root]
+    from bench_cse import PROGRAMS, compile
+    from cse_machine import CSEMachine
+    observer = None
+    if observed:
+        from observer import Observer
+        observer = Observer()
+
+    results = []
+    for name, generate in PROGRAMS:
+        deltas = compile(generate(size))
+        fastest = None
+        for _ in range(repeats):
+            machine = CSEMachine(deltas) if observer is None else CSEMachine(deltas, observer=observer)
+            start = time.perf_counter()
+            machine.run()
+            elapsed = time.perf_counter() - start
+            if fastest is None or elapsed < fastest:
+                fastest = elapsed
+        results.append((name, machine.steps, fastest))
+    print(json.dumps(results))
+
+
+def run(root, observed, size, repeats):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--time", root,
+         "1" if observed else "0", str(size), str(repeats)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def git(*args):
+    return subprocess.run(["git", "-C", ROOT] + list(args), check=True, capture_output=True).stdout
+
+
+def extract(rev, directory):
+    # The tree of revision `rev`, written into `directory`
+    archive = tarfile.open(fileobj=io.BytesIO(git("archive", rev)))
+    archive.extractall(directory)
+    archive.close()
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "--time":
+        timeTree(args[1], args[2] == "1", int(args[3]), int(args[4]))
+        return
+
+    rev = None
+    if "--against" in args:
+        index = args.index("--against")
+        rev = args[index + 1]
+        del args[index:index + 2]
+    size = int(args[0]) if len(args) > 0 else 200
+    repeats = int(args[1]) if len(args) > 1 else 5
+
+    try:
+        if rev is None:
+            added = git("log", "--diff-filter=A", "--format=%H", "--", "observer.py").split()
+            rev = added[-1].decode() + "^"
+        directory = tempfile.mkdtemp(prefix="bench_hooks_")
+        extract(rev, directory)
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        sys.exit("bench_hooks.py needs git and a checkout with the history of observer.py")
+
+    try:
+        # The trees take turns, a few rounds each, so a change in machine
+        # load hits them alike
+        before = after = observed = None
+        for _ in range(ROUNDS):
+            times = [
+                run(directory, False, size, repeats),
+                run(ROOT, False, size, repeats),
+                run(ROOT, True, size, repeats),
+            ]
+            if before is None:
+                before, after, observed = times
+                continue
+            for best, new in zip((before, after, observed), times):
+                for row, newRow in zip(best, new):
+                    row[2] = min(row[2], newRow[2])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print("%-22s %9s %14s %14s %8s %14s %8s" % (
+        "program", "steps", "before hooks", "no observer", "ratio", "null observer", "ratio"))
+    for (_, _, old), (name, steps, plain), (_, _, hooked) in zip(before, after, observed):
+        print("%-22s %9d %12.3f s %12.3f s %7.2fx %12.3f s %7.2fx" % (
+            name, steps, old, plain, plain / old, hooked, hooked / plain))
+
+
+if __name__ == "__main__":
+    main()
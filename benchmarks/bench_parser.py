@@ -0,0 +1,66 @@
+# Parser throughput benchmark
+# Usage: python3 benchmarks/bench_parser.py [size]
+#
+# Generates a few synthetic RPAL programs, scans them once and reports how
+# long the parser takes to build the AST from the token list.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scanner import RPAL_Scanner
+from ASTParser import ASTParser
+
+
+def wideProgram(size):
+    # Many sibling definitions with mixed operators
+    defs = " and ".join(
+        "f%d x y = x * %d + y - %d / 2 ** x gr %d -> (x aug y) | (x, y, %d)" % (i, i, i, i, i)
+        for i in range(size)
+    )
+    return "let " + defs + " in Print (f0 1 2)"
+
+
+def nestedLets(size):
+    # let x0 = 0 in let x1 = x0 + 1 in ... (deep right nesting)
+    return "".join("let x%d = x%d + 1 in " % (i + 1, i) for i in range(size)) + "x%d" % size
+
+
+def nestedParens(size):
+    return "(" * size + "1" + " + 1)" * size
+
+
+def nestedConditionals(size):
+    return "x -> " * size + "1" + " | 0" * size
+
+
+PROGRAMS = [
+    ("wide definitions", wideProgram),
+    ("nested lets", nestedLets),
+    ("nested parentheses", nestedParens),
+    ("nested conditionals", nestedConditionals),
+]
+
+
+def bench(name, source):
+    tokens = list(RPAL_Scanner(None).generateTokens(source))
+    parser = ASTParser(tokens)
+    parser.current_token = next(parser.tokens)
+    start = time.perf_counter()
+    parser.parse()
+    elapsed = time.perf_counter() - start
+    status = "error" if parser.isAnError() else "ok"
+    print("%-22s %9d tokens %8.3f s %12.0f tokens/s  %s"
+          % (name, len(tokens), elapsed, len(tokens) / elapsed, status))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for name, generate in PROGRAMS:
+        bench(name, generate(size))
+
+
+if __name__ == "__main__":
+    main()
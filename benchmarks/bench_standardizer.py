@@ -0,0 +1,176 @@
+# Standardizer benchmark
+# Usage: python3 benchmarks/bench_standardizer.py [size] [--against rev]
+#
+# Parses generated programs that use every construct the standardizer
+# rewrites (let, where, within, rec, and, fcn_form, multi-parameter fn, @)
+# and reports how long it takes to standardize each tree: with the
+# standardizer of git revision `rev`, by default the one before this
+# benchmark was added, run ten times over the tree as myrpal.py did then,
+# and with this tree's single pass of makeST.
+#
+# Each tree is timed in a child process of its own, as the two trees'
+# modules have the same names. The older tree is extracted with git
+# archive into a temporary directory, so this needs a git checkout. The
+# older standardizer recurses; a program too deep for it even with the
+# larger stack it is given shows as "recursion".
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+OLD_PASSES = 10  # How many times myrpal.py ran makeST before the single pass
+# The older standardizer recurses once per level of nesting and once per
+# sibling; it is run on a thread with a stack and recursion limit this
+# large so that it can finish the programs at all
+OLD_STACK = 1 << 30
+OLD_RECURSION_LIMIT = 1000000
+
+
+def definitions(size):
+    # let f0 a b = ... and f1 a b = ... in ..., each body using where/within/rec
+    defs = " and ".join(
+        "f%d a b = (fn x y . x + y) a (g b) where rec g n = n eq 0 -> %d | g (n - 1)" % (i, i)
+        for i in range(size)
+    )
+    return "let " + defs + " in f0 1 2"
+
+
+def nestedScopes(size):
+    # let x0 = 0 within y0 = x0 @Add 1 in let ... (deeply nested)
+    return "".join(
+        "let x%d = %d within y%d = x%d @Add 1 in " % (i, i, i, i) for i in range(size)
+    ) + "0"
+
+
+def tupleDefinitions(size):
+    names = ", ".join("v%d" % i for i in range(size))
+    values = ", ".join(str(i) for i in range(size))
+    return "let %s = %s in v0" % (names, values)
+
+
+PROGRAMS = [
+    ("function definitions", definitions),
+    ("nested scopes", nestedScopes),
+    ("tuple definitions", tupleDefinitions),
+]
+
+
+def timeTree(root, old, size):
+    # Child process: the nodes parsed and the seconds standardizing took
+    # for each program with the standardizer in `root`, as a JSON list.
+    # None stands for a parse error or a RecursionError.
+    sys.path[:] = [path for path in sys.path if os.path.abspath(path or ".") != HERE]
+    sys.path.insert(0, root)
+    from scanner import RPAL_Scanner
+    from ASTParser import ASTParser
+    from standardizer import standardizer
+
+    results = []
+    for name, generate in PROGRAMS:
+        parser = ASTParser(RPAL_Scanner(None).generateTokens(generate(size)))
+        parser.startParsing("")
+        if parser.isAnError():
+            results.append((name, None, None))
+            continue
+        root = parser.stack[0]
+        nodes = len(parser.arena)
+        start = time.perf_counter()
+        try:
+            if old:
+                stand = standardizer(parser.arena, root)
+                for _ in range(OLD_PASSES):
+                    stand.makeST(root)
+            else:
+                standardizer(parser.arena).makeST(root)
+        except RecursionError:
+            results.append((name, nodes, None))
+            continue
+        results.append((name, nodes, time.perf_counter() - start))
+    print(json.dumps(results))
+
+
+def timeOldTree(root, size):
+    # timeTree on a thread with room for the older standardizer's recursion
+    sys.setrecursionlimit(OLD_RECURSION_LIMIT)
+    threading.stack_size(OLD_STACK)
+    thread = threading.Thread(target=timeTree, args=(root, True, size))
+    thread.start()
+    thread.join()
+
+
+def run(root, old, size):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--time", root, "1" if old else "0", str(size)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def git(*args):
+    return subprocess.run(["git", "-C", ROOT] + list(args), check=True, capture_output=True).stdout
+
+
+def extract(rev, directory):
+    # The tree of revision `rev`, written into `directory`
+    archive = tarfile.open(fileobj=io.BytesIO(git("archive", rev)))
+    archive.extractall(directory)
+    archive.close()
+
+
+def seconds(value):
+    return "%10s" % "recursion" if value is None else "%8.3f s" % value
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "--time":
+        if args[2] == "1":
+            timeOldTree(args[1], int(args[3]))
+        else:
+            timeTree(args[1], False, int(args[3]))
+        return
+
+    rev = None
+    if "--against" in args:
+        index = args.index("--against")
+        rev = args[index + 1]
+        del args[index:index + 2]
+    size = int(args[0]) if args else 20000
+
+    try:
+        if rev is None:
+            added = git("log", "--diff-filter=A", "--format=%H", "--",
+                        "benchmarks/bench_standardizer.py").split()
+            rev = added[-1].decode() + "^"
+        directory = tempfile.mkdtemp(prefix="bench_standardizer_")
+        extract(rev, directory)
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        sys.exit("bench_standardizer.py needs git and a checkout with its own history")
+
+    try:
+        before = run(directory, True, size)
+        after = run(ROOT, False, size)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print("%-22s %9s %10s %10s %12s %8s" % (
+        "program", "nodes", "%d passes" % OLD_PASSES, "one pass", "nodes/s", "speedup"))
+    for (_, _, old), (name, nodes, new) in zip(before, after):
+        if nodes is None:
+            print("%-22s parse error" % name)
+            continue
+        speedup = "%7.1fx" % (old / new) if old is not None and new else "%8s" % "-"
+        rate = "%12.0f" % (nodes / new) if new else "%12s" % "-"
+        print("%-22s %9d %s %s %s %s" % (name, nodes, seconds(old), seconds(new), rate, speedup))
+
+
+if __name__ == "__main__":
+    main()
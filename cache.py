@@ -0,0 +1,222 @@
+import hashlib
+import mmap
+import os
+import struct
+from ASTNode import *
+from instructions import *
+from values import constantValue, constantNode
+
+# Compiled programs are cached next to their source, like __pycache__:
+#   dir/prog.rpal -> dir/__rpalcache__/prog.rpalc
+# A cache file is only used when its header carries the same compiler
+# version and the same hash of the source, so stale files are ignored and
+# rewritten. The compiler version is a hash of the sources of the modules
+# that decide what control structures a program compiles to, and of this
+# one, which decides how they are stored: editing any of them makes every
+# cache file stale, with nothing to remember to bump.
+CACHE_DIR = "__rpalcache__"
+CACHE_SUFFIX = ".rpalc"
+COMPILER_SOURCES = (
+    "scanner.py", "symbols.py", "ASTNode.py", "ASTArena.py", "ASTParser.py",
+    "standardizer.py", "optimizer.py", "codegen.py", "instructions.py",
+    "values.py", "cache.py",
+)
+MAGIC = b"RPALC\x00\r\n"
+LENGTH = struct.Struct("<I")
+
+
+def compilerHash():
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in COMPILER_SOURCES:
+        with open(os.path.join(directory, name), "rb") as f:
+            source = f.read()
+        digest.update(LENGTH.pack(len(source)))
+        digest.update(source)
+    return digest.digest()
+
+
+COMPILER_HASH = compilerHash()
+# The header's version field holds the first bytes of the hash
+CACHE_VERSION = LENGTH.unpack_from(COMPILER_HASH)[0]
+
+# magic, version, sha256 of compiler hash + source, string count, delta count
+HEADER = struct.Struct("<8sI32sII")
+# One instruction: opcode, then two small fields and two integers whose
+# meaning depends on the opcode:
+#   OP_PUSH     kind of the value, string index of its spelling
+#   OP_LOOKUP   depth, slot
+#   OP_UNBOUND  string index of the name
+#   OP_LAMBDA   delta index, arity; the bound variable follows as node
+#               records
+#   OP_BETA     then delta index, else delta index
+#   OP_TAU      number of elements
+# A node record is kind, number of children, string index, and is
+# followed by the records of its children.
+RECORD = struct.Struct("<BxHii")
+
+
+def sourceHash(source):
+    # source is the program's bytes
+    digest = hashlib.sha256()
+    digest.update(COMPILER_HASH)
+    digest.update(source)
+    return digest.digest()
+
+
+def cachePath(file):
+    directory, name = os.path.split(file)
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0] + CACHE_SUFFIX)
+
+
+def storeControlStructures(file, digest, controlStructures):
+    # Best effort, like Python's own bytecode cache: a directory we cannot
+    # write to just means the next run compiles again
+    strings = {}
+    records = []
+
+    def stringIndex(text):
+        return strings.setdefault(text, len(strings))
+
+    def addNode(node):
+        count = 0
+        child = node.left
+        while child is not None:
+            count += 1
+            child = child.right
+        records.append(RECORD.pack(node.kind, count, stringIndex(node.value), 0))
+        child = node.left
+        while child is not None:
+            addNode(child)
+            child = child.right
+
+    def addInstruction(instruction):
+        opcode, operand = instruction
+        if opcode == OP_PUSH:
+            kind, text = constantNode(operand)
+            records.append(RECORD.pack(opcode, kind, stringIndex(text), 0))
+        elif opcode == OP_LOOKUP:
+            records.append(RECORD.pack(opcode, 0, operand[0], operand[1]))
+        elif opcode == OP_UNBOUND:
+            records.append(RECORD.pack(opcode, 0, stringIndex(operand), 0))
+        elif opcode == OP_LAMBDA:
+            deltaIndex, arity, boundVar = operand
+            records.append(RECORD.pack(opcode, 0, deltaIndex, arity))
+            addNode(boundVar)
+        elif opcode == OP_BETA:
+            records.append(RECORD.pack(opcode, 0, operand[0], operand[1]))
+        elif opcode == OP_TAU:
+            records.append(RECORD.pack(opcode, 0, operand, 0))
+        else:
+            records.append(RECORD.pack(opcode, 0, 0, 0))
+
+    deltaLengths = []
+    for delta in controlStructures:
+        deltaLengths.append(LENGTH.pack(len(delta)))
+        for instruction in delta:
+            addInstruction(instruction)
+
+    parts = [HEADER.pack(MAGIC, CACHE_VERSION, digest, len(strings), len(controlStructures))]
+    for text in strings:
+        encoded = text.encode("utf-8")
+        parts.append(LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    parts.extend(deltaLengths)
+    parts.extend(records)
+
+    path = cachePath(file)
+    temp = path + ".tmp%d" % os.getpid()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(temp, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temp, path)  # Readers never see a half written file
+    except OSError:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
+def loadControlStructures(file, digest):
+    # Return the cached control structures for this source, or None when
+    # there is no usable cache file
+    try:
+        with open(cachePath(file), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return decode(data, digest)
+    except (OSError, ValueError, IndexError, KeyError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def decode(data, digest):
+    magic, version, fileDigest, numOfStrings, numOfDeltas = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != CACHE_VERSION or fileDigest != digest:
+        return None
+    offset = HEADER.size
+
+    strings = []
+    for _ in range(numOfStrings):
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    deltaLengths = [
+        LENGTH.unpack_from(data, offset + k * LENGTH.size)[0] for k in range(numOfDeltas)
+    ]
+    offset += numOfDeltas * LENGTH.size
+
+    view = memoryview(data)[offset:]
+    if len(view) % RECORD.size:
+        view.release()
+        raise ValueError("truncated cache file")
+    records = RECORD.iter_unpack(view)
+
+    operatorInstructions = {}
+
+    def readNode():
+        kind, count, value, _ = next(records)
+        node = ASTNode(kind, strings[value])
+        tail = None
+        for _ in range(count):
+            child = readNode()
+            if tail is None:
+                node.left = child
+            else:
+                tail.right = child
+            tail = child
+        return node
+
+    def readInstruction():
+        opcode, small, value, extra = next(records)
+        if opcode == OP_PUSH:
+            return (opcode, constantValue(small, strings[value]))
+        if opcode == OP_LOOKUP:
+            return (opcode, (value, extra))
+        if opcode == OP_UNBOUND:
+            return (opcode, strings[value])
+        if opcode == OP_LAMBDA:
+            return (opcode, (value, extra, readNode()))
+        if opcode == OP_BETA:
+            return (opcode, (value, extra))
+        if opcode == OP_TAU:
+            return (opcode, value)
+        if opcode >= len(OPCODE_NAMES):
+            raise ValueError("bad opcode in cache file")
+        # Operators take no operand, so one tuple serves every occurrence
+        instruction = operatorInstructions.get(opcode)
+        if instruction is None:
+            instruction = operatorInstructions[opcode] = (opcode, None)
+        return instruction
+
+    try:
+        controlStructures = [
+            [readInstruction() for _ in range(length)] for length in deltaLengths
+        ]
+    except StopIteration:
+        raise ValueError("truncated cache file")
+    finally:
+        del records
+        view.release()
+    return controlStructures
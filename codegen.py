@@ -0,0 +1,140 @@
+from ASTArena import *
+from instructions import *
+from values import constantValue
+
+# Opcodes of the operators, which take no operand
+OPERATOR_OPCODES = {
+    GAMMA: OP_GAMMA, AUG: OP_AUG, NEG: OP_NEG, NOT: OP_NOT,
+    OR: OP_OR, AMP: OP_AMP, GR: OP_GR, GE: OP_GE, LS: OP_LS, LE: OP_LE,
+    EQ: OP_EQ, NE: OP_NE, PLUS: OP_PLUS, MINUS: OP_MINUS, MULT: OP_MULT,
+    DIV: OP_DIV, POW: OP_POW,
+}
+OPERATOR_INSTRUCTIONS = {kind: (opcode, None) for kind, opcode in OPERATOR_OPCODES.items()}
+
+# Leaves that are pushed as they are
+CONSTANT_LEAVES = frozenset((INT, STR, TRUE, FALSE, NIL, DUMMY, YSTAR))
+
+
+class ControlStructureGenerator:
+    # Turns a standardized tree into the CSE machine's control structures:
+    # a list of deltas, each a list of instructions (see instructions.py)
+    # that the machine pushes onto its control stack and runs from the end.
+    # Operands are worked out here, once, so a lambda or a conditional is a
+    # single instruction rather than several items. Delta 0 is the program;
+    # every lambda body and every branch of a conditional gets a delta of
+    # its own. All state lives on the instance, so separate programs can
+    # be compiled one after another or on several threads at once.
+    def __init__(self, arena):
+        self.arena = arena
+        self.deltas = []
+
+    def newDelta(self):
+        self.deltas.append([])
+        return len(self.deltas) - 1
+
+    def generate(self, root):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        self.deltas = deltas = []
+
+        # Nodes still to emit, with the delta each one goes to and the
+        # scope it is in. A scope is (names, enclosing scope): the names a
+        # lambda binds, in slot order, which is also how the CSE machine
+        # lays out the environment the lambda's application creates. The
+        # program runs in an environment of its own that binds nothing.
+        # tail is true for a node whose value is the value of the lambda
+        # body it is in: the body itself, and the branches of a tail
+        # conditional. A gamma there is compiled as a tail call. Children
+        # are pushed last to first so every delta comes out in pre-order.
+        pending = [(root, deltas[self.newDelta()], ((), None), False)]
+        while pending:
+            x, delta, scope, tail = pending.pop()
+            if x == NO_NODE:
+                continue
+            kind = kinds[x]
+
+            if kind == LAMBDA:
+                # The body becomes delta k
+                bodyIndex = self.newDelta()
+                boundVar = arena.toASTNode(left[x])
+                names = self.boundNames(boundVar)
+                delta.append((OP_LAMBDA, (bodyIndex, len(names), boundVar)))
+                bodyScope = (names, scope)
+                pending.append((right[left[x]], deltas[bodyIndex], bodyScope, True))
+
+            elif kind == COND:
+                # beta, then the condition itself
+                condition = left[x]
+                thenIndex = self.newDelta()
+                elseIndex = self.newDelta()
+                delta.append((OP_BETA, (thenIndex, elseIndex)))
+                pending.append((right[right[condition]], deltas[elseIndex], scope, tail))
+                pending.append((right[condition], deltas[thenIndex], scope, tail))
+                pending.append((condition, delta, scope, False))
+
+            elif kind == TAU:
+                children = []
+                child = left[x]
+                while child != NO_NODE:
+                    children.append(child)
+                    child = right[child]
+                delta.append((OP_TAU, len(children)))
+                for child in reversed(children):
+                    pending.append((child, delta, scope, False))
+
+            elif kind == ID:
+                # A name a lambda binds is a variable, even if it is also
+                # the name of a built-in function
+                name = arena.getValue(x)
+                address = self.resolve(name, scope)
+                if address is not None:
+                    delta.append((OP_LOOKUP, address))
+                elif name in BUILTIN_NAMES:
+                    delta.append((OP_PUSH, constantValue(ID, name)))
+                else:
+                    delta.append((OP_UNBOUND, name))
+
+            elif kind in CONSTANT_LEAVES:
+                delta.append((OP_PUSH, constantValue(kind, arena.getValue(x))))
+
+            else:
+                # An operator followed by its (at most two) operands. Nodes
+                # the standardizer could not rewrite emit only their operands.
+                if kind == GAMMA and tail:
+                    instruction = TAIL_GAMMA_INSTRUCTION
+                else:
+                    instruction = OPERATOR_INSTRUCTIONS.get(kind)
+                if instruction is not None:
+                    delta.append(instruction)
+                child = left[x]
+                if child != NO_NODE:
+                    pending.append((right[child], delta, scope, False))
+                    pending.append((child, delta, scope, False))
+
+        return deltas
+
+    def boundNames(self, boundVar):
+        # x binds one slot, (x, y) one slot per name, () none
+        if boundVar.kind == COMMA:
+            names = []
+            child = boundVar.left
+            while child is not None:
+                names.append(child.value)
+                child = child.right
+            return tuple(names)
+        if boundVar.kind == ID:
+            return (boundVar.value,)
+        return ()
+
+    def resolve(self, name, scope):
+        # (depth, slot) of the innermost binding of name, or None. A name
+        # bound twice by one lambda refers to its first slot.
+        depth = 0
+        while scope is not None:
+            names, scope = scope
+            if name in names:
+                return (depth, names.index(name))
+            depth += 1
+        return None
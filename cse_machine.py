@@ -0,0 +1,595 @@
+import operator
+import sys
+from environment import Environment
+from instructions import *
+from values import *
+
+
+class DivisionByZero(ZeroDivisionError):
+    # Raised by a / whose right operand is 0; the machine reports it in
+    # its output before passing it on
+    pass
+
+
+def divide(num1, num2):
+    if num2 == 0:  # If division by zero
+        raise DivisionByZero("integer division by zero")
+    # Integer division rounds towards zero
+    quotient = abs(num1) // abs(num2)
+    return quotient if (num1 < 0) == (num2 < 0) else -quotient
+
+
+def power(num1, num2):
+    result = num1 ** num2
+    return result if num2 >= 0 else int(result)
+
+
+# Operators on two integers, by opcode. Arithmetic results are pushed as
+# integers, comparisons as truth values.
+ARITHMETIC = {
+    OP_PLUS: operator.add,
+    OP_MINUS: operator.sub,
+    OP_MULT: operator.mul,
+    OP_DIV: divide,
+    OP_POW: power,
+}
+COMPARISONS = {
+    OP_GR: operator.gt,
+    OP_GE: operator.ge,
+    OP_LS: operator.lt,
+    OP_LE: operator.le,
+}
+# Operators that also accept two strings or two truth values
+EQUALITIES = {OP_EQ: operator.eq, OP_NE: operator.ne}
+# Operators that only accept two truth values
+LOGICAL = {OP_OR: operator.or_, OP_AMP: operator.and_}
+
+# Types whose values an equality may compare with each other
+EQUALITY_TYPES = (int, str, bool)
+
+# Program output is kept until this many characters have been printed,
+# then written in one go
+OUTPUT_BUFFER = 1 << 16
+
+
+class CSEMachine:
+    # Runs the instruction lists the code generator produces. Each step pops
+    # one (opcode, operand) pair off the control stack and calls the handler
+    # stored at that opcode in self.handlers, so dispatch is one list index
+    # instead of a chain of comparisons. A handler stops the machine by
+    # clearing the control stack. The values on the stack are described in
+    # values.py. With tailCalls off, tail gammas run as plain gammas and
+    # every call keeps its frame until it returns. What the program prints
+    # goes to `out`, standard output by default, through a buffer that
+    # run() empties when it stops. An observer (see observer.py) is told
+    # of every step, call and return.
+    def __init__(self, deltas, tailCalls=True, out=None, observer=None):
+        self.deltas = deltas
+        self.control = []  # Stack of instructions
+        self.stack = []  # Stack of operands
+        self.getCurrEnvironment = []  # Environments still open
+        self.currEnv = None
+        self.steps = 0  # Instructions run so far
+        self.out = sys.stdout if out is None else out
+        self.output = []  # Printed text not yet written to out
+        self.outputSize = 0
+
+        self.observer = observer
+        if observer is not None:
+            self.observe(observer)
+
+        handlers = [None] * len(OPCODE_NAMES)
+        handlers[OP_PUSH] = self.push
+        handlers[OP_LOOKUP] = self.lookup
+        handlers[OP_UNBOUND] = self.unbound
+        handlers[OP_LAMBDA] = self.makeLambda
+        handlers[OP_GAMMA] = self.gamma
+        handlers[OP_TAIL_GAMMA] = self.tailGamma if tailCalls else self.gamma
+        handlers[OP_BETA] = self.beta
+        handlers[OP_TAU] = self.makeTuple
+        handlers[OP_AUG] = self.aug
+        handlers[OP_ENV] = self.exitEnvironment
+        handlers[OP_NEG] = self.neg
+        handlers[OP_NOT] = self.logicalNot
+        for opcode, operation in ARITHMETIC.items():
+            handlers[opcode] = self.arithmetic(operation)
+        for opcode, operation in COMPARISONS.items():
+            handlers[opcode] = self.comparison(operation)
+        for opcode, operation in EQUALITIES.items():
+            handlers[opcode] = self.equality(operation)
+        for opcode, operation in LOGICAL.items():
+            handlers[opcode] = self.logical(operation)
+        self.handlers = handlers
+
+        # What gamma does, by the type of the value it applies
+        self.appliers = {
+            Closure: self.applyLambda,  # CSE Rule 4
+            Tuple: self.selectTuple,  # CSE Rule 10
+            YStar: self.applyYStar,  # CSE Rule 12
+            Eta: self.applyEta,  # CSE Rule 13
+            Builtin: self.applyBuiltin,
+        }
+
+        # What applying a built-in does, by its code (see instructions.py)
+        builtins = [None] * len(BUILTIN_FUNCTIONS)
+        builtins[BI_PRINT] = self.printValue
+        builtins[BI_ISINTEGER] = self.isInteger
+        builtins[BI_ISTRUTHVALUE] = self.isTruthValue
+        builtins[BI_ISSTRING] = self.isString
+        builtins[BI_ISTUPLE] = self.isTuple
+        builtins[BI_ISFUNCTION] = self.isFunction
+        builtins[BI_ISDUMMY] = self.isDummy
+        builtins[BI_STEM] = self.stem
+        builtins[BI_STERN] = self.stern
+        builtins[BI_CONC] = self.conc
+        builtins[BI_ORDER] = self.order
+        self.builtins = builtins
+
+    def run(self):
+        self.currEnv = Environment()  # e0
+        self.enterEnvironment(self.currEnv)
+        self.control.extend(self.deltas[0])
+
+        try:
+            self.loop()
+        except DivisionByZero:
+            self.write("Exception: STATUS_INTEGER_DIVIDE_BY_ZERO\n")
+            raise
+        finally:
+            self.flush()
+
+    def loop(self):
+        # Runs instructions until the control stack is empty
+        control = self.control
+        handlers = self.handlers
+        steps = 0
+        try:
+            while control:
+                opcode, operand = control.pop()
+                handlers[opcode](operand)
+                steps += 1
+        finally:
+            self.steps += steps
+
+    def write(self, text):
+        self.output.append(text)
+        self.outputSize += len(text)
+        if self.outputSize >= OUTPUT_BUFFER:
+            self.flush()
+
+    def flush(self):
+        if self.output:
+            self.out.write("".join(self.output))
+            self.output.clear()
+            self.outputSize = 0
+        self.out.flush()
+
+    def observe(self, observer):
+        # Shadows, on this machine only, the methods where the observer's
+        # events happen with versions that raise them. The handler tables
+        # built after this pick the versions up, and so do the methods that
+        # call these through self. The class's own methods, and so every
+        # machine without an observer, have no hooks to check.
+        enterEnvironment = self.enterEnvironment
+        applyLambda = self.applyLambda
+        exitEnvironment = self.exitEnvironment
+        onStep = observer.onStep
+
+        def observedLoop():
+            control = self.control
+            handlers = self.handlers
+            steps = 0
+            try:
+                while control:
+                    opcode, operand = control.pop()
+                    onStep(self, opcode, operand)
+                    handlers[opcode](operand)
+                    steps += 1
+            finally:
+                self.steps += steps
+
+        def observedEnterEnvironment(env):
+            enterEnvironment(env)
+            observer.onEnterEnvironment(self, env)
+
+        def observedApplyLambda():
+            if self.getCurrEnvironment[-1] is not self.currEnv:
+                # tailGamma has just dropped the caller's frame
+                observer.onExitEnvironment(self, self.currEnv)
+            depth = len(self.getCurrEnvironment)
+            observer.onCall(self, self.stack[-1], self.stack[-2])
+            applyLambda()
+            if len(self.getCurrEnvironment) == depth:
+                # Answered without running the body, as MemoCSEMachine
+                # does from its cache: there is no environment to leave
+                observer.onReturn(self, None, self.stack[-1])
+
+        def observedExitEnvironment(env):
+            if len(self.stack) < 2 or self.stack[-2] is not env:
+                exitEnvironment(env)  # Halts
+                return
+            exitEnvironment(env)
+            observer.onExitEnvironment(self, env)
+            if env.prev is not None:  # Not the program's own
+                observer.onReturn(self, env, self.stack[-1])
+
+        self.loop = observedLoop
+        self.enterEnvironment = observedEnterEnvironment
+        self.applyLambda = observedApplyLambda
+        self.exitEnvironment = observedExitEnvironment
+
+    def halt(self):
+        self.control.clear()
+
+    def enterEnvironment(self, env):
+        # The same environment object marks both stacks, so leaving it is
+        # an identity check rather than a comparison of names
+        self.control.append((OP_ENV, env))
+        self.stack.append(env)
+        self.getCurrEnvironment.append(env)
+
+    def push(self, value):
+        self.stack.append(value)
+
+    def makeLambda(self, operand):
+        deltaIndex, arity, boundVar = operand
+        self.stack.append(Closure(deltaIndex, arity, boundVar, self.currEnv))
+
+    def lookup(self, address):
+        depth, slot = address
+        env = self.currEnv
+        for _ in range(depth):
+            env = env.prev
+        value = env.slots[slot]
+        if value is None:  # Bound by a tuple of names that got no value
+            self.halt()
+            return
+        self.stack.append(value)
+
+    def unbound(self, name):
+        self.halt()
+
+    def gamma(self, _):
+        applier = self.appliers.get(type(self.stack[-1]))
+        if applier is not None:
+            applier()
+        # Nothing else can be applied
+
+    def tailGamma(self, _):
+        # A call whose result is the caller's result. The caller's frame
+        # (its environment marker on both stacks, right under the call) is
+        # removed before the call, so the callee returns straight to the
+        # caller's caller and loops run in constant space.
+        stack = self.stack
+        top = stack[-1]
+        if type(top) is Closure:
+            env = self.currEnv
+            control = self.control
+            if stack[-3] is env and control and control[-1][1] is env:
+                control.pop()
+                del stack[-3]
+                self.getCurrEnvironment.pop()
+            self.applyLambda()
+        elif type(top) is Eta:
+            stack.append(top.closure)
+            self.control.append(TAIL_GAMMA_INSTRUCTION)
+            self.control.append(GAMMA_INSTRUCTION)
+        else:
+            self.gamma(_)
+
+    def applyLambda(self):
+        stack = self.stack
+        closure = stack.pop()
+        rand = stack.pop()
+
+        # Bind the rand to the bound variable's slots
+        arity = closure.arity
+        if arity == 1:
+            slots = [rand]
+        elif arity:
+            # One slot per name; names a tuple has no element for, or that
+            # were given something other than a tuple, stay empty
+            slots = [None] * arity
+            if type(rand) is Tuple:
+                slots[:rand.length] = rand.elements()
+        else:
+            slots = []  # () binds nothing
+
+        newEnv = Environment(closure.env, slots)
+        self.currEnv = newEnv
+        self.enterEnvironment(newEnv)
+        self.control.extend(self.deltas[closure.delta])
+
+    def selectTuple(self):
+        stack = self.stack
+        tup = stack.pop()
+        stack[-1] = tup.get(stack[-1])
+
+    def applyYStar(self):
+        stack = self.stack
+        stack.pop()  # Pop YSTAR token
+        closure = stack[-1]
+        if type(closure) is not Closure:
+            self.write("Error\n")
+            self.halt()
+            return
+        body = self.deltas[closure.delta]
+        if closure.arity == 1 and len(body) == 1 and body[0][0] == OP_LAMBDA:
+            # rec F = fn x. E: bind F once, in an environment of its own,
+            # to the closure of fn x. E made there. Recursive calls then
+            # look F up like any variable instead of unfolding an eta
+            # (CSE Rule 13) on every call.
+            deltaIndex, arity, boundVar = body[0][1]
+            env = Environment(closure.env, [None])
+            env.slots[0] = Closure(deltaIndex, arity, boundVar, env, True)
+            stack[-1] = env.slots[0]
+        else:
+            stack[-1] = Eta(closure)
+
+    def applyEta(self):
+        # Leave the eta in place and apply its closure to it, then apply the
+        # result to the argument
+        self.stack.append(self.stack[-1].closure)
+        self.control.append(GAMMA_INSTRUCTION)
+        self.control.append(GAMMA_INSTRUCTION)
+
+    def exitEnvironment(self, env):
+        # CSE Rule 5: remove the environment marker under the value on top.
+        # An ill-typed operation can leave the stack without a value above
+        # the marker, or with nothing at all; the machine halts then.
+        stack = self.stack
+        if len(stack) < 2 or stack[-2] is not env:
+            self.halt()
+            return
+        del stack[-2]
+
+        self.getCurrEnvironment.pop()
+        if self.getCurrEnvironment:
+            self.currEnv = self.getCurrEnvironment[-1]
+        else:
+            self.currEnv = None
+
+    def beta(self, deltaIndices):
+        thenIndex, elseIndex = deltaIndices
+        self.control.extend(self.deltas[thenIndex if self.stack.pop() is True else elseIndex])
+
+    def makeTuple(self, numOfItems):
+        # The first element is on top of the stack
+        stack = self.stack
+        items = stack[-numOfItems:]
+        del stack[-numOfItems:]
+        items.reverse()
+        stack.append(Tuple(items))
+
+    def aug(self, _):
+        stack = self.stack
+        left = stack.pop()
+        right = stack.pop()
+        if left is NIL_VALUE:
+            stack.append(Tuple([right]))
+        elif type(left) is Tuple:
+            stack.append(left.aug(right))
+        else:
+            raise TypeError("aug expects a tuple on its left")
+
+    # Binary operators (CSE Rule 6). Both operands are always popped; an
+    # operator given operands it does not accept pushes nothing.
+    def arithmetic(self, operation):
+        stack = self.stack
+
+        def apply(_):
+            num1 = stack.pop()
+            num2 = stack.pop()
+            if type(num1) is int and type(num2) is int:
+                stack.append(operation(num1, num2))
+
+        return apply
+
+    def comparison(self, operation):
+        stack = self.stack
+
+        def apply(_):
+            num1 = stack.pop()
+            num2 = stack.pop()
+            if type(num1) is int and type(num2) is int:
+                stack.append(operation(num1, num2))
+
+        return apply
+
+    def equality(self, operation):
+        stack = self.stack
+
+        def apply(_):
+            value1 = stack.pop()
+            value2 = stack.pop()
+            kind = type(value1)
+            if kind is type(value2) and kind in EQUALITY_TYPES:
+                stack.append(operation(value1, value2))
+            elif kind in STRING_TYPES and type(value2) in STRING_TYPES:
+                # A view or a rope; strings of different lengths differ,
+                # so only strings of the same length are flattened
+                length1 = stringLength(value1)
+                length2 = stringLength(value2)
+                if length1 != length2:
+                    stack.append(operation(length1, length2))
+                else:
+                    stack.append(operation(flatString(value1), flatString(value2)))
+
+        return apply
+
+    def logical(self, operation):
+        stack = self.stack
+
+        def apply(_):
+            value1 = stack.pop()
+            value2 = stack.pop()
+            if type(value1) is bool and type(value2) is bool:
+                stack.append(operation(value1, value2))
+
+        return apply
+
+    # Unary operators (CSE Rule 7)
+    def neg(self, _):
+        num = self.stack.pop()
+        if type(num) is not int:
+            raise TypeError("neg expects an integer")
+        self.stack.append(-num)
+
+    def logicalNot(self, _):
+        stack = self.stack
+        if type(stack[-1]) is bool:
+            stack[-1] = not stack[-1]
+
+    # Built-in functions, applied by gamma with the function on top of the
+    # stack and its argument below it
+    def applyBuiltin(self):
+        builtin = self.stack.pop()
+        self.builtins[builtin.code](builtin)
+
+    def printValue(self, builtin):
+        # Prints the argument and leaves it on the stack as the result
+        value = self.stack[-1]
+        if type(value) is Closure and not value.recursive:
+            self.write(f"[lambda closure: {value.boundVar.getVal()}: {value.delta}]\n")
+            self.halt()
+        else:
+            self.write(self.valueString(value))
+
+    def isInteger(self, builtin):
+        self.stack[-1] = type(self.stack[-1]) is int
+
+    def isTruthValue(self, builtin):
+        self.stack[-1] = type(self.stack[-1]) is bool
+
+    def isString(self, builtin):
+        self.stack[-1] = type(self.stack[-1]) in STRING_TYPES
+
+    def isTuple(self, builtin):
+        value = self.stack[-1]
+        self.stack[-1] = type(value) is Tuple or value is NIL_VALUE
+
+    def isFunction(self, builtin):
+        self.stack[-1] = type(self.stack[-1]) in FUNCTION_TYPES
+
+    def isDummy(self, builtin):
+        self.stack[-1] = self.stack[-1] is DUMMY_VALUE
+
+    def stem(self, builtin):
+        stack = self.stack
+        value = stack[-1]
+        kind = type(value)
+        if kind is StringView:
+            stack[-1] = value.base[value.start]  # Views are never empty
+        elif kind is str or kind is Rope:
+            value = flatString(value)
+            if value == "":
+                self.halt()
+            else:
+                stack[-1] = value[0]
+
+    def stern(self, builtin):
+        # Long strings lose their first character to a view instead of a
+        # copy (see StringView)
+        stack = self.stack
+        value = stack[-1]
+        kind = type(value)
+        if kind is StringView:
+            base = value.base
+            start = value.start + 1
+        elif kind is str or kind is Rope:
+            base = flatString(value)
+            if base == "":
+                self.halt()
+                return
+            start = 1
+        else:
+            return
+        if len(base) - start <= SHORT_STRING:
+            stack[-1] = base[start:]
+        else:
+            stack[-1] = StringView(base, start)
+
+    def order(self, builtin):
+        stack = self.stack
+        value = stack[-1]
+        if type(value) is Tuple:
+            stack[-1] = value.length
+        elif value is NIL_VALUE:
+            stack[-1] = 0
+        else:
+            raise TypeError("Order expects a tuple")
+
+    def conc(self, builtin):
+        # Conc takes its two strings one at a time
+        stack = self.stack
+        if not builtin.args:
+            stack[-1] = Builtin(builtin.code, (stack[-1],))
+            return
+        first = builtin.args[0]
+        second = stack[-1]
+        if type(first) not in STRING_TYPES or type(second) not in STRING_TYPES:
+            raise TypeError("Conc expects two strings")
+        if stringLength(first) + stringLength(second) <= SHORT_STRING:
+            stack[-1] = flatString(first) + flatString(second)
+        else:
+            stack[-1] = Rope(first, second)  # Joined once it is needed
+
+    def valueString(self, value):
+        kind = type(value)
+        if kind is str:
+            return self.addSpaces(value)
+        if kind is StringView or kind is Rope:
+            return self.addSpaces(flatString(value))
+        if kind is bool:
+            return "true" if value else "false"
+        if kind is int:
+            return str(value)
+        if kind is Tuple:
+            return self.tupleString(value)
+        if value is NIL_VALUE:
+            return "nil"
+        if value is DUMMY_VALUE:
+            return "dummy"
+        if kind is Builtin:
+            return value.name
+        if kind is Eta or kind is Closure and value.recursive:
+            return "eta"
+        if value is YSTAR_VALUE:
+            return "Y*"
+        if kind is Environment:
+            # A stray environment marker; environments have no names, so
+            # show how deep this one is
+            depth = 0
+            env = value.prev
+            while env is not None:
+                depth += 1
+                env = env.prev
+            return "env" + str(depth)
+        return str(value)
+
+    def tupleString(self, value):
+        # Elements of nested tuples are printed as if they were one flat
+        # tuple; nil and functions are left out. Each element is formatted
+        # as the walk reaches it, and a stack of iterators stands in for
+        # recursion, so nesting depth is not limited by Python's recursion
+        # limit.
+        valueString = self.valueString
+        parts = []
+        pending = [iter(value.elements())]
+        while pending:
+            for item in pending[-1]:
+                if type(item) is Tuple:
+                    pending.append(iter(item.elements()))
+                    break
+                if item is not NIL_VALUE and not (type(item) is Closure and not item.recursive):
+                    parts.append(valueString(item))
+            else:
+                pending.pop()
+        return "(" + ", ".join(parts) + ")"
+
+    def addSpaces(self, temp):
+        if "\\" not in temp and "'" not in temp:
+            return temp  # Most strings have nothing to replace
+        temp = temp.replace("\\n", '\n').replace("\\t", '\t')
+        temp = temp.replace("'", "")
+        return temp
@@ -1,10 +1,11 @@
 class Environment:
-    def __init__(self, other=None):
-        if other is None:
-            self.prev = None  # Pointer to the previous environment
-            self.name = "env0"  # Default name
-            self.boundVar = {}  # Map of bound variables to their values
-        else:
-            self.prev = other.prev
-            self.name = other.name
-            self.boundVar = other.boundVar.copy()
\ No newline at end of file
+    # One environment per lambda application. The code generator resolves
+    # every variable to a (depth, slot) pair, so a lookup follows prev
+    # depth times and indexes slots; no names are stored here. Closures and
+    # the machine's environment markers refer to the object itself.
+    __slots__ = ("prev", "slots")
+
+    def __init__(self, prev=None, slots=None):
+        self.prev = prev  # Pointer to the previous environment
+        # Values of the bound variables, by slot; fixed once bound
+        self.slots = [] if slots is None else slots
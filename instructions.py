@@ -0,0 +1,51 @@
+# Opcodes of the instructions the code generator emits and the CSE
+# machine runs. A delta is a list of (opcode, operand) pairs; the machine
+# pushes a delta onto its control stack and runs it from the end. Operands
+# are decoded at compile time:
+#   OP_PUSH     the value to push (a literal or a built-in function), as
+#               described in values.py
+#   OP_LOOKUP   (depth, slot) of the variable: how many environments up
+#               it was bound, and its position in that environment
+#   OP_UNBOUND  the name of a variable no enclosing lambda binds
+#   OP_LAMBDA   (body delta index, arity, bound variable node). The arity
+#               is 1 for a single name, which binds the whole argument,
+#               the number of names for a tuple of names, and 0 for ().
+#               The node is kept for printing and profiling only.
+#   OP_BETA     (then delta index, else delta index)
+#   OP_TAU      number of tuple elements
+#   OP_ENV      the environment the marker closes
+# All other opcodes take no operand. OP_TAIL_GAMMA is a gamma whose result
+# is the result of the lambda body it is in.
+(
+    OP_PUSH, OP_LOOKUP, OP_UNBOUND, OP_LAMBDA, OP_GAMMA, OP_TAIL_GAMMA,
+    OP_BETA, OP_TAU, OP_AUG, OP_ENV,
+    OP_OR, OP_AMP, OP_GR, OP_GE, OP_LS, OP_LE, OP_EQ, OP_NE,
+    OP_PLUS, OP_MINUS, OP_MULT, OP_DIV, OP_POW,
+    OP_NEG, OP_NOT,
+) = range(25)
+
+OPCODE_NAMES = (
+    "push", "lookup", "unbound", "lambda", "gamma", "tail gamma",
+    "beta", "tau", "aug", "env",
+    "or", "&", "gr", "ge", "ls", "le", "eq", "ne",
+    "+", "-", "*", "/", "**",
+    "neg", "not",
+)
+
+# Built-in functions. The code generator resolves a name no lambda binds
+# to the function's code, and the CSE machine applies it through a table
+# indexed by that code.
+(
+    BI_PRINT, BI_ISINTEGER, BI_ISTRUTHVALUE, BI_ISSTRING, BI_ISTUPLE,
+    BI_ISFUNCTION, BI_ISDUMMY, BI_STEM, BI_STERN, BI_CONC, BI_ORDER,
+) = range(11)
+
+BUILTIN_FUNCTIONS = (
+    "Print", "Isinteger", "Istruthvalue", "Isstring", "Istuple",
+    "Isfunction", "Isdummy", "Stem", "Stern", "Conc", "Order",
+)
+BUILTIN_NAMES = frozenset(BUILTIN_FUNCTIONS)
+
+# Instructions without an operand, shared by every delta that uses them
+GAMMA_INSTRUCTION = (OP_GAMMA, None)
+TAIL_GAMMA_INSTRUCTION = (OP_TAIL_GAMMA, None)
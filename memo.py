@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from cse_machine import CSEMachine
+from instructions import *
+from values import *
+
+# Results of calls are only cached for arguments of at most this many
+# values, counting the elements of nested tuples; hashing anything larger
+# on every call would cost more than most calls save
+MAX_KEY_SIZE = 256
+
+DEFAULT_MEMO_SIZE = 4096
+
+
+def memoKey(value):
+    # A hashable stand-in for a value, equal for values that are equal
+    # structurally: tuples by their elements, functions by identity. Truth
+    # values are tagged, as True == 1 in Python. None if the value is too
+    # big to be worth a key.
+    budget = [MAX_KEY_SIZE]
+
+    def key(value):
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise OverflowError
+        kind = type(value)
+        if kind is int:
+            return value
+        if kind in STRING_TYPES:
+            # Charged by length, as the whole string is hashed
+            budget[0] -= stringLength(value) // 8
+            if budget[0] < 0:
+                raise OverflowError
+            return flatString(value)
+        if kind is bool:
+            return (bool, value)
+        if kind is Tuple:
+            return (Tuple,) + tuple(key(item) for item in value.elements())
+        if kind is Builtin and value.args:
+            return (Builtin, value.code) + tuple(key(arg) for arg in value.args)
+        return value  # nil, dummy, Y* and functions
+
+    try:
+        return key(value)
+    except OverflowError:
+        return None
+
+
+def printingDeltas(deltas):
+    # Indices of the deltas whose code can get to the Print built-in
+    # without calling anything: those that push it, their enclosing
+    # lambda bodies and the deltas of the conditionals around them.
+    # A Print passed in as an argument is caught as the program runs.
+    parents = [[] for _ in deltas]
+    found = []
+    for index, delta in enumerate(deltas):
+        for opcode, operand in delta:
+            if opcode == OP_PUSH and type(operand) is Builtin and operand.code == BI_PRINT:
+                found.append(index)
+            elif opcode == OP_LAMBDA:
+                parents[operand[0]].append(index)
+            elif opcode == OP_BETA:
+                parents[operand[0]].append(index)
+                parents[operand[1]].append(index)
+
+    printing = set(found)
+    while found:
+        for parent in parents[found.pop()]:
+            if parent not in printing:
+                printing.add(parent)
+                found.append(parent)
+    return printing
+
+
+class MemoCSEMachine(CSEMachine):
+    # A CSE machine that remembers what applying a rec-bound function to
+    # an argument gave, in a cache of `size` entries that drops the least
+    # recently used one when full. RPAL values never change, so a function
+    # that does not print gives the same result for the same argument, and
+    # a call found in the cache is replaced by its result without running
+    # the body. Functions whose body can print are never cached: those
+    # found by printingDeltas are skipped from the start, and a call that
+    # printed anything while it ran is not stored and marks its function
+    # as printing.
+    def __init__(self, deltas, tailCalls=True, out=None, observer=None, size=DEFAULT_MEMO_SIZE):
+        CSEMachine.__init__(self, deltas, tailCalls, out, observer)
+        self.size = size
+        self.cache = OrderedDict()  # (closure, argument key) -> result
+        self.pending = {}  # Environment of a call -> its key, prints so far
+        self.printing = printingDeltas(deltas)
+        self.prints = 0  # Print applications so far
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0  # Calls of rec-bound functions that may print
+
+    def report(self):
+        calls = self.hits + self.misses
+        rate = 100.0 * self.hits / calls if calls else 0.0
+        return "memo: %d hits, %d misses (%.1f%% hit rate), %d evictions, %d entries, %d calls not cached as they may print" % (
+            self.hits, self.misses, rate, self.evictions, len(self.cache), self.skipped)
+
+    def applyLambda(self):
+        stack = self.stack
+        closure = stack[-1]
+        if not closure.recursive:
+            CSEMachine.applyLambda(self)
+            return
+        if closure.delta in self.printing:
+            self.skipped += 1
+            CSEMachine.applyLambda(self)
+            return
+        argument = memoKey(stack[-2])
+        if argument is None:
+            CSEMachine.applyLambda(self)
+            return
+
+        key = (closure, argument)
+        cache = self.cache
+        result = cache.get(key, cache)
+        if result is not cache:
+            self.hits += 1
+            cache.move_to_end(key)
+            stack.pop()
+            stack[-1] = result
+            # A call in tail position has already left the caller's
+            # environment (see tailGamma); go on in the one below it
+            self.currEnv = self.getCurrEnvironment[-1]
+            return
+
+        self.misses += 1
+        CSEMachine.applyLambda(self)
+        self.pending[self.currEnv] = (key, self.prints)
+
+    def tailGamma(self, _):
+        # A call made in tail position from a call waiting for its result
+        # keeps the caller's frame, as leaving it is what stores the result
+        if self.currEnv in self.pending:
+            self.gamma(_)
+        else:
+            CSEMachine.tailGamma(self, _)
+
+    def exitEnvironment(self, env):
+        entry = self.pending.pop(env, None)
+        if entry is None or len(self.stack) < 2 or self.stack[-2] is not env:
+            CSEMachine.exitEnvironment(self, env)
+            return
+        CSEMachine.exitEnvironment(self, env)
+
+        key, prints = entry
+        if prints != self.prints:
+            # It printed, so running it again must print again
+            self.printing.add(key[0].delta)
+            return
+        cache = self.cache
+        cache[key] = self.stack[-1]
+        if len(cache) > self.size:
+            cache.popitem(last=False)
+            self.evictions += 1
+
+    def printValue(self, builtin):
+        self.prints += 1
+        CSEMachine.printValue(self, builtin)
@@ -1,22 +1,72 @@
 from standardizer import *
+from codegen import ControlStructureGenerator
+from optimizer import optimize
+from cse_machine import CSEMachine
+from memo import MemoCSEMachine, DEFAULT_MEMO_SIZE
+from profiler import ProfilingCSEMachine
+from observer import Tracer
+from cache import sourceHash, loadControlStructures, storeControlStructures
 from scanner import RPAL_Scanner
 from ASTParser import ASTParser
+import os
 import sys
 
 hasParsingError = False
 hasCSEError = False
 hasInputError = False
 astFlag = ""
+outFile = None  # File given with -o; output goes to stdout without it
+memoSize = None  # Entries of the call cache --memo asks for
+profileFile = None  # Where --profile writes the folded stacks
+trace = False  # --trace: show calls and returns on stderr
+useCache = True  # --no-cache: neither read nor write __rpalcache__
+optimizing = True  # --no-opt: run the standardized tree as it is
 
-if len(sys.argv) == 2:
-    file = sys.argv[1]
+args = sys.argv[1:]
+while args and args[0] in ("--no-cache", "--no-opt"):
+    if args[0] == "--no-cache":
+        useCache = False
+    else:
+        # The cache only holds optimized programs
+        optimizing = useCache = False
+    args = args[1:]
+
+if args and args[0].startswith("--memo"):
+    size = args[0][len("--memo"):]
+    if size == "":
+        memoSize = DEFAULT_MEMO_SIZE
+    elif size[:1] == "=" and size[1:].isdigit() and int(size[1:]) > 0:
+        memoSize = int(size[1:])
+    else:
+        hasInputError = True
+    args = args[1:]
+elif args and args[0] == "--trace":
+    trace = True
+    args = args[1:]
+elif args and args[0].startswith("--profile"):
+    profileFile = args[0][len("--profile"):]
+    if profileFile[:1] == "=" and len(profileFile) > 1:
+        profileFile = profileFile[1:]
+    elif profileFile == "" and len(args) > 1:
+        # prog.rpal -> prog.folded, in the current directory
+        profileFile = os.path.splitext(os.path.basename(args[1]))[0] + ".folded"
+    else:
+        hasInputError = True
+    args = args[1:]
+
+if len(args) >= 2 and args[-2] == "-o":
+    outFile = args[-1]
+    args = args[:-2]
+
+if len(args) == 1:
+    file = args[0]
     astFlag = ""
 
-elif len(sys.argv) == 3 and sys.argv[1] == "-ast":
-    file = sys.argv[2]
-    astFlag = "-ast"
+elif len(args) == 2 and args[0] in ("-ast", "-opt", "-report"):
+    file = args[1]
+    astFlag = args[0]
 
-elif len(sys.argv) == 3 and sys.argv[1] != "-ast":
+elif len(args) == 2:
     hasInputError = True
     astFlag = "invalid"
 
@@ -24,54 +74,107 @@ else:
     hasInputError = True
     astFlag = "invalid"
 
+if (memoSize is not None or profileFile is not None or trace) and astFlag != "":
+    hasInputError = True  # --memo, --profile and --trace only change how a program runs
+if not optimizing and astFlag == "-report":
+    hasInputError = True  # There is nothing to report
+
 if not hasInputError:
     scanner = RPAL_Scanner(file)  # Give the name of the file
+    setOfControlStruct = None
 
     try:
-        tokens = scanner.Scanning()
+        tokens = scanner.tokens()
+
+        # A program compiled before, by this compiler version, can skip the
+        # front end and run straight from its cached control structures
+        if astFlag == "" and useCache:
+            with open(file, "rb") as f:
+                digest = sourceHash(f.read())
+            setOfControlStruct = loadControlStructures(file, digest)
 
     except:
         hasInputError = True
         print("There is no such a file :", file)
 
-    if not hasInputError:
-        myParser = ASTParser(tokens)
-        myParser.startParsing(astFlag)
+    if not hasInputError and setOfControlStruct is None:
+        myParser = ASTParser(tokens, scanner.symbols)
+        if astFlag in ("-opt", "-report"):
+            myParser.startParsing("")
+        elif astFlag == "-ast" and outFile is not None:
+            with open(outFile, "w", buffering=1 << 20) as out:
+                myParser.startParsing(astFlag, out)
+        else:
+            myParser.startParsing(astFlag)
         hasParsingError = myParser.isAnError()
 
-        if not hasParsingError:
+        # With -ast the tree is all that is printed, so stop here
+        if not hasParsingError and astFlag != "-ast":
             root = myParser.stack[0]
-            stand = standardizer(root)
-
-            for i in range(10):
-                stand.makeST(root)
-            
-            controlStructureArray = [[None for _ in range(200)] for _ in range(200)]
-            stand.createControlStructures(root, controlStructureArray)
-
-            size = 0
-            while controlStructureArray[size][0] is not None:
-                size += 1
-
-            setOfControlStruct = []
-            for x in range(size):
-                temp = []
-                for y in range(200):
-                    if controlStructureArray[x][y] is not None:
-                        temp.append(controlStructureArray[x][y])
-                setOfControlStruct.append(temp)
-            
-            if astFlag != "-ast":
-                try:
-                    stand.cse_machine(setOfControlStruct)
-                except Exception as e:
-                    print("CSE machine error")
-                    print(e)
-
-        elif hasParsingError:
-            pass 
+            stand = standardizer(myParser.arena)
+
+            stand.makeST(root)
+            if optimizing:
+                passes = optimize(myParser.arena, root)
+
+            if astFlag == "-opt":
+                # Print the optimized standardized tree instead of running it
+                if outFile is not None:
+                    with open(outFile, "w", buffering=1 << 20) as out:
+                        myParser.preOrderTraversal(root, out)
+                else:
+                    myParser.preOrderTraversal(root)
+            elif astFlag == "-report":
+                # Say what each optimization did instead of running it
+                report = "\n".join(p.report() for p in passes) + "\n"
+                if outFile is not None:
+                    with open(outFile, "w") as out:
+                        out.write(report)
+                else:
+                    print(report, end="")
+            else:
+                setOfControlStruct = ControlStructureGenerator(myParser.arena).generate(root)
+
+                if useCache:
+                    storeControlStructures(file, digest, setOfControlStruct)
+
+    if setOfControlStruct is not None:
+        # The program's output, and any error it ends with, go to the -o
+        # file if there is one
+        out = sys.stdout if outFile is None else open(outFile, "w", buffering=1 << 20)
+        if memoSize is not None:
+            machine = MemoCSEMachine(setOfControlStruct, out=out, size=memoSize)
+        elif profileFile is not None:
+            machine = ProfilingCSEMachine(setOfControlStruct, out=out)
+        elif trace:
+            machine = CSEMachine(setOfControlStruct, out=out, observer=Tracer(sys.stderr))
+        else:
+            machine = CSEMachine(setOfControlStruct, out=out)
+        try:
+            machine.run()
+        except Exception as e:
+            print("CSE machine error", file=out)
+            print(e, file=out)
+        if outFile is not None:
+            out.close()
+        if memoSize is not None:
+            # On stderr, so the program's own output is unchanged
+            print(machine.report(), file=sys.stderr)
+        elif profileFile is not None:
+            print(machine.report(), end="", file=sys.stderr)
+            with open(profileFile, "w") as folded:
+                folded.write(machine.foldedStacks())
+            print("folded stacks written to", profileFile, file=sys.stderr)
 
 else:
     print("Input Format is Wrong")
     print("Input format ==>  python .\\myrpal.py file_name")
     print("To print the AST use -ast flag before the file name.")
+    print("To print the optimized standardized tree use -opt flag before the file name.")
+    print("To print what the optimizer removed use -report flag before the file name.")
+    print("To write the output, tree or report to a file add -o out_file after the file name.")
+    print("To cache the results of rec functions use --memo or --memo=size before the file name.")
+    print("To profile the program use --profile or --profile=folded_file before the file name.")
+    print("To trace its calls and returns use --trace before the file name.")
+    print("To compile without reading or writing __rpalcache__ put --no-cache first.")
+    print("To run the program without optimizing it put --no-opt first.")
@@ -0,0 +1,63 @@
+from values import Closure
+
+# Hooks for watching the CSE machine run. Pass an object with these
+# methods to CSEMachine(deltas, observer=...); subclass Observer and
+# override only the events you need. Each hook is given the machine, so
+# it can look at machine.stack, machine.control and machine.currEnv, but
+# it must not change them. A machine made without an observer runs a loop
+# with no hooks in it at all.
+#
+# The events, in the order the machine raises them:
+#   onStep             before each instruction: its opcode and operand
+#                      (see instructions.py)
+#   onCall             a lambda is applied: the closure and its argument
+#   onEnterEnvironment an environment is opened: the program's own at the
+#                      start, then one for each lambda applied
+#   onExitEnvironment  an environment is closed. The environment of a call
+#                      made in tail position is closed when it makes that
+#                      call, as the call replaces it (see tailGamma).
+#   onReturn           a call has returned: its environment, and the value
+#                      it gave, which is also on top of the stack. The
+#                      environment is None for a call answered without
+#                      running its body, such as a --memo cache hit.
+# A call that returns raises onExitEnvironment then onReturn. A call that
+# ends with a tail call returns nothing itself; the call it made does.
+
+
+class Observer:
+    def onStep(self, machine, opcode, operand):
+        pass
+
+    def onCall(self, machine, closure, argument):
+        pass
+
+    def onEnterEnvironment(self, machine, env):
+        pass
+
+    def onExitEnvironment(self, machine, env):
+        pass
+
+    def onReturn(self, machine, env, value):
+        pass
+
+
+class Tracer(Observer):
+    # Writes one line per call and return to `out`, indented by how many
+    # calls are open: what a program did, without adding prints to the
+    # machine
+    def __init__(self, out):
+        self.out = out
+
+    def onCall(self, machine, closure, argument):
+        self.out.write("%scall %d with %s\n" % (
+            "  " * (len(machine.getCurrEnvironment) - 1), closure.delta,
+            self.show(machine, argument)))
+
+    def onReturn(self, machine, env, value):
+        self.out.write("%sreturn %s\n" % (
+            "  " * (len(machine.getCurrEnvironment) - 1), self.show(machine, value)))
+
+    def show(self, machine, value):
+        if type(value) is Closure and not value.recursive:
+            return "[lambda closure: %s: %d]" % (value.boundVar.getVal(), value.delta)
+        return machine.valueString(value)
@@ -0,0 +1,661 @@
+from ASTArena import *
+from instructions import BUILTIN_NAMES, OP_DIV, OP_POW
+from codegen import OPERATOR_OPCODES
+from cse_machine import ARITHMETIC, COMPARISONS, EQUALITIES, LOGICAL, EQUALITY_TYPES
+from values import constantValue, constantNode
+
+# Leaves whose value is known at compile time
+FOLDABLE_LEAVES = frozenset((INT, STR, TRUE, FALSE, NIL, DUMMY))
+
+# Largest power, in bits, that is worked out at compile time. A bigger one
+# is left to the CSE machine, which may never reach it.
+MAX_POWER_BITS = 4096
+
+
+def boundNames(arena, boundVar):
+    # x binds one name, (x, y) one per name, () none
+    kind = arena.kinds[boundVar]
+    if kind == ID:
+        return (arena.getValue(boundVar),)
+    if kind == COMMA:
+        return tuple(arena.getValue(child) for child in children(arena, boundVar))
+    return ()
+
+
+def children(arena, x):
+    left = arena.left
+    right = arena.right
+    nodes = []
+    child = left[x]
+    while child != NO_NODE:
+        nodes.append(child)
+        child = right[child]
+    return nodes
+
+
+class ConstantFolder:
+    # Evaluates, on the standardized tree, what the CSE machine would work
+    # out the same way every time it got there: operators on literals,
+    # conditionals with a literal test, Conc of two strings, and Order and
+    # selection on tuples of literals. A folded node is overwritten in place
+    # with its result, so the tree keeps its shape and the code generator
+    # sees nothing new. Anything that would fail or halt at run time is left
+    # alone, so the machine still reports it when, and only if, it gets there.
+    def __init__(self, arena):
+        self.arena = arena
+        self.folded = 0  # Nodes replaced so far
+
+    def fold(self, root):
+        # Children are folded before their parent, so a parent sees literal
+        # operands wherever they could be worked out. shadowed holds the
+        # built-in names a lambda around the node rebinds; those are left
+        # alone.
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        foldNode = self.foldNode
+
+        pending = [(root, frozenset(), False)]
+        while pending:
+            x, shadowed, childrenDone = pending.pop()
+            if x == NO_NODE:
+                continue
+            if childrenDone:
+                foldNode(x, shadowed)
+                continue
+
+            pending.append((x, shadowed, True))
+            if kinds[x] == LAMBDA:
+                # The bound variable is not an expression; only the body is
+                names = BUILTIN_NAMES.intersection(boundNames(arena, left[x]))
+                if names:
+                    shadowed = shadowed | names
+                pending.append((right[left[x]], shadowed, False))
+            else:
+                child = left[x]
+                while child != NO_NODE:
+                    pending.append((child, shadowed, False))
+                    child = right[child]
+
+    def literal(self, x):
+        # The value of a literal leaf, or None
+        kind = self.arena.kinds[x]
+        if kind in FOLDABLE_LEAVES:
+            return constantValue(kind, self.arena.getValue(x))
+        return None
+
+    def isBuiltin(self, x, name, shadowed):
+        arena = self.arena
+        return arena.kinds[x] == ID and arena.getValue(x) == name and name not in shadowed
+
+    def replaceWithValue(self, x, value):
+        kind, text = constantNode(value)
+        self.arena.setLeaf(x, kind, text)
+        self.folded += 1
+
+    def replaceWithNode(self, x, node):
+        self.arena.overwrite(x, node)
+        self.folded += 1
+
+    def report(self):
+        return "constant folding: %d nodes folded" % self.folded
+
+    def foldNode(self, x, shadowed):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        kind = kinds[x]
+
+        if kind in BINARY_OPERATORS:
+            value1 = self.literal(left[x])
+            value2 = self.literal(right[left[x]])
+            if value1 is None or value2 is None:
+                return
+            result = self.binary(OPERATOR_OPCODES[kind], value1, value2)
+            if result is not None:
+                self.replaceWithValue(x, result)
+
+        elif kind == NEG:
+            value = self.literal(left[x])
+            if type(value) is int:
+                self.replaceWithValue(x, -value)
+
+        elif kind == NOT:
+            value = self.literal(left[x])
+            if type(value) is bool:
+                self.replaceWithValue(x, not value)
+
+        elif kind == COND:
+            # The branch a literal truth value picks replaces the conditional
+            condition = left[x]
+            if kinds[condition] == TRUE:
+                self.replaceWithNode(x, right[condition])
+            elif kinds[condition] == FALSE:
+                self.replaceWithNode(x, right[right[condition]])
+
+        elif kind == GAMMA:
+            rator = left[x]
+            rand = right[rator]
+            ratorKind = kinds[rator]
+
+            if self.isBuiltin(rator, "Order", shadowed):
+                if kinds[rand] == NIL:
+                    self.replaceWithValue(x, 0)
+                elif kinds[rand] == TAU:
+                    elements = children(arena, rand)
+                    if all(kinds[element] in FOLDABLE_LEAVES for element in elements):
+                        self.replaceWithValue(x, len(elements))
+
+            elif ratorKind == GAMMA and self.isBuiltin(left[rator], "Conc", shadowed):
+                first = self.literal(right[left[rator]])
+                second = self.literal(rand)
+                if type(first) is str and type(second) is str:
+                    self.replaceWithValue(x, first + second)
+
+            elif ratorKind == TAU:
+                # Selecting from a tuple of literals and lambdas only drops
+                # elements that cost nothing to make
+                index = self.literal(rand)
+                elements = children(arena, rator)
+                if type(index) is int and 1 <= index <= len(elements) and all(
+                    kinds[element] in FOLDABLE_LEAVES or kinds[element] == LAMBDA
+                    for element in elements
+                ):
+                    self.replaceWithNode(x, elements[index - 1])
+
+    def binary(self, opcode, value1, value2):
+        # The result the CSE machine would push, or None where it would
+        # push nothing or fail
+        kind = type(value1)
+        if opcode in ARITHMETIC:
+            if kind is not int or type(value2) is not int:
+                return None
+            if opcode == OP_DIV and value2 == 0:
+                return None
+            if opcode == OP_POW and (
+                value2 < 0 and value1 == 0
+                or abs(value1) > 1 and value2 * value1.bit_length() > MAX_POWER_BITS
+            ):
+                return None
+            return ARITHMETIC[opcode](value1, value2)
+        if opcode in COMPARISONS:
+            if kind is int and type(value2) is int:
+                return COMPARISONS[opcode](value1, value2)
+            return None
+        if opcode in EQUALITIES:
+            if kind is type(value2) and kind in EQUALITY_TYPES:
+                return EQUALITIES[opcode](value1, value2)
+            return None
+        if kind is bool and type(value2) is bool:
+            return LOGICAL[opcode](value1, value2)
+        return None
+
+
+# Largest lambda, in nodes, that is copied to more than one call site
+MAX_INLINE_SIZE = 40
+
+# Nodes copies of lambdas may add to a tree, at the least; bigger trees
+# may grow by their own size
+MIN_INLINE_BUDGET = 256
+
+# Markers the scope analysis pushes around a lambda body
+ENTER_SCOPE = -1
+LEAVE_SCOPE = -2
+
+# Most times the inliner goes over the tree. Each round finds the
+# reductions the previous one made possible.
+MAX_INLINE_ROUNDS = 8
+
+
+class ScopeAnalysis:
+    # What the passes below need to know about the variables of a tree:
+    # where each one is used and which lambda binds each use. A scope is
+    # (bound variable node, names, enclosing scope); bindings are told
+    # apart by their bound variable node, which stays with a lambda that
+    # is moved in the tree.
+    def __init__(self, arena):
+        self.arena = arena
+        self.uses = {}  # (bound variable node, name) to [(ID node, scope)]
+        self.binders = {}  # ID node to the scope that binds it
+        self.callSites = set()  # Nodes that are the function of a gamma
+        self.analyzed = set()  # Bound variable nodes the analysis saw
+        self.applications = []  # Gamma nodes, each before those under it
+
+    def analyze(self, root):
+        # Finds what every variable refers to, as the code generator will.
+        # visible maps each name to the scopes binding it, innermost last;
+        # a lambda's names are added just before its body is walked and
+        # taken off right after. Returns the number of nodes in the tree.
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        getValue = arena.getValue
+        self.uses = uses = {}
+        self.binders = binders = {}
+        self.callSites = callSites = set()
+        self.analyzed = analyzed = set()
+        self.applications = applications = []
+        visible = {}
+
+        size = 0
+        pending = [(root, None)]
+        while pending:
+            x, scope = pending.pop()
+            if x == ENTER_SCOPE:
+                for name in scope[1]:
+                    visible.setdefault(name, []).append(scope)
+                continue
+            if x == LEAVE_SCOPE:
+                for name in scope[1]:
+                    visible[name].pop()
+                continue
+            while x != NO_NODE:
+                size += 1
+                kind = kinds[x]
+                if kind == LAMBDA:
+                    boundVar = left[x]
+                    analyzed.add(boundVar)
+                    bodyScope = (boundVar, boundNames(arena, boundVar), scope)
+                    pending.append((LEAVE_SCOPE, bodyScope))
+                    pending.append((right[boundVar], bodyScope))
+                    pending.append((ENTER_SCOPE, bodyScope))
+                elif kind == ID:
+                    name = getValue(x)
+                    entries = visible.get(name)
+                    if entries:
+                        binders[x] = entries[-1]
+                        uses.setdefault((entries[-1][0], name), []).append((x, scope))
+                elif left[x] != NO_NODE:
+                    if kind == GAMMA:
+                        callSites.add(left[x])
+                        applications.append(x)
+                    pending.append((left[x], scope))
+                x = right[x]
+        return size
+
+    def treeSize(self, x):
+        left = self.arena.left
+        right = self.arena.right
+        size = 0
+        pending = [x]
+        while pending:
+            node = pending.pop()
+            size += 1
+            child = left[node]
+            while child != NO_NODE:
+                pending.append(child)
+                child = right[child]
+        return size
+
+
+class Inliner(ScopeAnalysis):
+    # Beta reduces, on the standardized tree, the gamma(lambda x. B, A)
+    # that let, where and function definitions turn into, wherever A is a
+    # value: a literal, a lambda, a variable bound by a single-name lambda,
+    # or a tuple of values. Making such a value cannot fail and has no
+    # effect, so B with A put in place of x computes what the application
+    # did, without the environment the CSE machine makes for it. A binding
+    # is substituted when it is used at most once, when its value is a
+    # literal or a variable, or when it is a lambda or tuple of at most
+    # MAX_INLINE_SIZE nodes that is only ever applied, so each use becomes
+    # a reduction or a selection of its own. Copies may make the tree grow
+    # by at most budget nodes, by default its size when inlining starts or
+    # MIN_INLINE_BUDGET, whichever is more. rec definitions are applications
+    # of Y* rather than lambdas, so recursive functions are never inlined.
+    def __init__(self, arena, budget=None):
+        ScopeAnalysis.__init__(self, arena)
+        self.budget = budget
+        self.inlined = 0  # Reductions made so far
+
+    def inline(self, root):
+        for _ in range(MAX_INLINE_ROUNDS):
+            size = self.analyze(root)
+            if self.budget is None:
+                self.budget = max(size, MIN_INLINE_BUDGET)
+            before = self.inlined
+            self.reduceAll(root)
+            if self.inlined == before:
+                break
+
+    def report(self):
+        return "inlining: %d applications reduced" % self.inlined
+
+    def reduceAll(self, root):
+        # Top down, so the bindings around a node are substituted before
+        # any reduction under it moves that node
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        reduce = self.reduce
+
+        pending = [root]
+        while pending:
+            x = pending.pop()
+            while kinds[x] == GAMMA and kinds[left[x]] == LAMBDA and reduce(x):
+                pass  # x is now the body; it may be a reduction itself
+            child = left[x]
+            if kinds[x] == LAMBDA:
+                child = right[child]
+            while child != NO_NODE:
+                pending.append(child)
+                child = right[child]
+
+    def bindings(self, boundVar, rand):
+        # (name, value) pairs the application binds, or None
+        arena = self.arena
+        kinds = arena.kinds
+        kind = kinds[boundVar]
+        if kind == ID:
+            return [(arena.getValue(boundVar), rand)] if self.isValue(rand) else None
+        if kind == EMPTY:
+            return [] if self.isValue(rand) else None
+        if kind == COMMA and kinds[rand] == TAU:
+            names = boundNames(arena, boundVar)
+            values = children(arena, rand)
+            if len(names) != len(values) or len(set(names)) != len(names):
+                return None
+            if not all(self.isValue(value) for value in values):
+                return None
+            return list(zip(names, values))
+        return None
+
+    def isValue(self, x):
+        arena = self.arena
+        kinds = arena.kinds
+        pending = [x]
+        while pending:
+            node = pending.pop()
+            kind = kinds[node]
+            if kind in FOLDABLE_LEAVES or kind == LAMBDA:
+                continue
+            if kind == TAU:
+                pending.extend(children(arena, node))
+            elif kind == ID:
+                # A variable bound by a tuple of names may have no value, and
+                # looking it up halts the machine
+                entry = self.binders.get(node)
+                if entry is None:
+                    if arena.getValue(node) not in BUILTIN_NAMES:
+                        return False
+                elif kinds[entry[0]] != ID:
+                    return False
+            else:
+                return False
+        return True
+
+    def reduce(self, x):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        rator = left[x]
+        boundVar = left[rator]
+        body = right[boundVar]
+
+        # A lambda copied since the analysis has no uses recorded
+        if boundVar not in self.analyzed:
+            return False
+        bindings = self.bindings(boundVar, right[rator])
+        if bindings is None:
+            return False
+
+        # Work out every substitution before making any of them
+        plan = []
+        growth = 0
+        for name, value in bindings:
+            sites = self.uses.get((boundVar, name), ())
+            if kinds[value] in (LAMBDA, TAU) and len(sites) > 1:
+                size = self.treeSize(value)
+                if size > MAX_INLINE_SIZE or not all(site in self.callSites for site, _ in sites):
+                    return False
+                growth += size * (len(sites) - 1)
+            free = self.freeNames(value)
+            if free and not all(self.isVisible(free, scope, boundVar) for _, scope in sites):
+                return False
+            plan.append((value, sites))
+        if growth > self.budget:
+            return False
+        self.budget -= growth
+
+        for value, sites in plan:
+            for i, (site, _) in enumerate(sites):
+                # The last use gets the value itself, the others copies
+                source = value if i == len(sites) - 1 else arena.copyTree(value)
+                arena.overwrite(site, source)
+                if kinds[source] == ID:
+                    self.binders[site] = self.binders.get(value)
+        arena.overwrite(x, body)
+        if kinds[x] == ID:
+            self.binders[x] = self.binders.get(body)
+        self.inlined += 1
+        return True
+
+    def isVisible(self, free, scope, boundVar):
+        # Whether no lambda between a use and the binding being reduced
+        # rebinds one of the names the value refers to
+        while scope[0] != boundVar:
+            if free.intersection(scope[1]):
+                return False
+            scope = scope[2]
+        return True
+
+    def freeNames(self, x):
+        # Names x refers to that it does not bind itself. A built-in name
+        # counts too: a lambda binding it would hide the built-in.
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        free = set()
+        pending = [(x, frozenset())]
+        while pending:
+            node, bound = pending.pop()
+            kind = kinds[node]
+            if kind == ID:
+                name = arena.getValue(node)
+                if name not in bound:
+                    free.add(name)
+            elif kind == LAMBDA:
+                pending.append((right[left[node]], bound.union(boundNames(arena, left[node]))))
+            else:
+                child = left[node]
+                while child != NO_NODE:
+                    pending.append((child, bound))
+                    child = right[child]
+        return free
+
+
+
+# Built-in functions that accept any argument and only look at it
+TYPE_TESTS = frozenset((
+    "Isinteger", "Istruthvalue", "Isstring", "Istuple", "Isfunction", "Isdummy",
+))
+
+
+class DeadBindingEliminator(ScopeAnalysis):
+    # Removes definitions nothing refers to. let and where turn a
+    # definition into gamma(lambda x. B, E); when B never uses x and E is
+    # pure, the application is replaced by B. A simultaneous definition
+    # (and) binds a tuple of names to a tuple of values, and its unused
+    # names are taken out of both. E is pure when evaluating it can neither
+    # print nor fail: a literal, a lambda, a variable that is sure to have
+    # a value, a rec function, a tuple of pure parts or a type test of
+    # one. The CSE machine evaluates every definition, so an unused one
+    # that may fail, like 1 / 0, still has to fail, and is kept. The
+    # inliner drops unused values already; what is left for this pass is
+    # mostly rec functions and the parts of and definitions. Definitions
+    # are visited innermost first, so one only an unused one refers to
+    # goes too.
+    def __init__(self, arena):
+        ScopeAnalysis.__init__(self, arena)
+        self.removed = 0  # Definitions dropped
+        self.removedNodes = 0  # Nodes they took up
+        self.kept = 0  # Unused definitions kept because they may not be pure
+        self.useCounts = {}  # (bound variable node, name) to number of uses
+        self.tupleBound = set()  # (bound variable node, name) given a value by a tau
+
+    def eliminate(self, root):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+
+        self.analyze(root)
+        self.useCounts = {key: len(sites) for key, sites in self.uses.items()}
+        # A tuple of names gets a value for each name when it is applied to
+        # a tuple of as many values, which is what and definitions make
+        self.tupleBound = tupleBound = set()
+        for x in self.applications:
+            rator = left[x]
+            if kinds[rator] == LAMBDA and kinds[left[rator]] == COMMA and kinds[right[rator]] == TAU:
+                names = boundNames(arena, left[rator])
+                if len(names) == len(children(arena, right[rator])):
+                    tupleBound.update((left[rator], name) for name in names)
+
+        for x in reversed(self.applications):
+            if kinds[x] == GAMMA and kinds[left[x]] == LAMBDA:
+                self.removeUnused(x)
+
+    def isPure(self, x):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        pending = [x]
+        while pending:
+            node = pending.pop()
+            kind = kinds[node]
+            if kind in FOLDABLE_LEAVES or kind == LAMBDA:
+                continue
+            if kind == ID:
+                name = arena.getValue(node)
+                # A variable bound by a tuple of names has no value when the
+                # tuple was short, and an unbound one has none at all
+                scope = self.binders.get(node)
+                if scope is None:
+                    if name in BUILTIN_NAMES:
+                        continue
+                    return False
+                if kinds[scope[0]] != ID and (scope[0], name) not in self.tupleBound:
+                    return False
+            elif kind == TAU:
+                pending.extend(children(arena, node))
+            elif kind == GAMMA:
+                rator = left[node]
+                rand = right[rator]
+                if kinds[rator] == YSTAR and kinds[rand] == LAMBDA:
+                    continue  # rec makes a function; nothing runs yet
+                if kinds[rator] != ID or rator in self.binders or arena.getValue(rator) not in TYPE_TESTS:
+                    return False
+                pending.append(rand)
+            else:
+                return False
+        return True
+
+    def removeUnused(self, x):
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        rator = left[x]
+        boundVar = left[rator]
+        body = right[boundVar]
+        rand = right[rator]
+
+        if kinds[boundVar] == ID:
+            name = arena.getValue(boundVar)
+            if self.useCounts.get((boundVar, name), 0):
+                return
+            if not self.isPure(rand):
+                self.kept += 1
+                return
+            self.forget(rand)
+            self.removed += 1
+            self.removedNodes += self.treeSize(rand) + 3
+            arena.overwrite(x, body)
+
+        elif kinds[boundVar] == COMMA and kinds[rand] == TAU:
+            names = children(arena, boundVar)
+            values = children(arena, rand)
+            if len(names) != len(values):
+                return
+            # A name bound twice is looked up in its first slot, so the
+            # later ones are never used
+            live = []
+            seen = set()
+            for name, value in zip(names, values):
+                text = arena.getValue(name)
+                unused = text in seen or not self.useCounts.get((boundVar, text), 0)
+                seen.add(text)
+                if unused and self.isPure(value):
+                    self.forget(value)
+                    self.removed += 1
+                    self.removedNodes += self.treeSize(value) + 1
+                    continue
+                if unused:
+                    self.kept += 1
+                live.append((name, value))
+
+            if len(live) == len(names):
+                return
+            if not live:
+                self.removedNodes += 4  # The gamma, lambda, comma and tau
+                arena.overwrite(x, body)
+            elif len(live) == 1:
+                # One name left: bind it directly, as a let would have
+                name, value = live[0]
+                left[rator] = name
+                right[name] = body
+                arena.overwrite(rand, value)
+                self.removedNodes += 2  # The comma and tau
+            else:
+                left[boundVar] = live[0][0]
+                left[rand] = live[0][1]
+                for (name, value), (nextName, nextValue) in zip(live, live[1:]):
+                    right[name] = nextName
+                    right[value] = nextValue
+                right[live[-1][0]] = NO_NODE
+                right[live[-1][1]] = NO_NODE
+
+    def forget(self, x):
+        # The uses under x are going away with it
+        arena = self.arena
+        kinds = arena.kinds
+        left = arena.left
+        right = arena.right
+        useCounts = self.useCounts
+        pending = [x]
+        while pending:
+            node = pending.pop()
+            if kinds[node] == ID:
+                scope = self.binders.get(node)
+                if scope is not None:
+                    useCounts[(scope[0], arena.getValue(node))] -= 1
+            child = left[node]
+            while child != NO_NODE:
+                pending.append(child)
+                child = right[child]
+
+    def report(self):
+        return "dead bindings: %d definitions removed (%d nodes), %d unused kept as they may print or fail" % (
+            self.removed, self.removedNodes, self.kept)
+
+
+def optimize(arena, root):
+    # The optimizations run between the standardizer and the code
+    # generator. Folding again after inlining picks up the literals that
+    # substitution put next to each other, and dead definitions are
+    # looked for last, once folding has dropped the branches that used
+    # them. Returns the passes, whose report() says what each one did.
+    folder = ConstantFolder(arena)
+    inliner = Inliner(arena)
+    eliminator = DeadBindingEliminator(arena)
+    folder.fold(root)
+    inliner.inline(root)
+    folder.fold(root)
+    eliminator.eliminate(root)
+    return [folder, inliner, eliminator]
@@ -0,0 +1,262 @@
+import time
+from cse_machine import CSEMachine
+from instructions import *
+from values import *
+
+# What each CSE rule counted by the profiler is called in its report. The
+# rules applying a value are counted as the value is applied; the others
+# by the opcode of the instruction that runs them.
+RULE_NAMES = {
+    OP_PUSH: "push a constant",
+    OP_LOOKUP: "look up a variable (Rule 1)",
+    OP_LAMBDA: "make a closure (Rule 2)",
+    OP_ENV: "leave an environment (Rule 5)",
+    OP_BETA: "choose a branch (Rule 8)",
+    OP_TAU: "make a tuple (Rule 9)",
+    OP_AUG: "aug",
+}
+for opcode in (OP_OR, OP_AMP, OP_GR, OP_GE, OP_LS, OP_LE, OP_EQ, OP_NE,
+               OP_PLUS, OP_MINUS, OP_MULT, OP_DIV, OP_POW):
+    RULE_NAMES[opcode] = "binary operator (Rule 6)"
+RULE_NAMES[OP_NEG] = RULE_NAMES[OP_NOT] = "unary operator (Rule 7)"
+
+APPLY_LAMBDA = "apply a lambda (Rule 4)"
+APPLY_TUPLE_LAMBDA = "apply a lambda of several names (Rule 11)"
+SELECT_TUPLE = "select from a tuple (Rule 10)"
+APPLY_YSTAR = "apply Y* (Rule 12)"
+APPLY_ETA = "apply an eta (Rule 13)"
+APPLY_BUILTIN = "apply %s (Rule 3)"
+
+
+def functionNames(deltas):
+    # What to call the function whose body is each delta: the name it was
+    # bound to, and its delta index to tell functions of the same name
+    # apart. A definition compiles to a gamma applying the lambda that
+    # binds the name, with the defined value as its rand:
+    #   let X = fn v. E       gamma, lambda X, lambda v
+    #   let rec X = fn v. E   gamma, lambda X, gamma, push Y*, lambda X
+    # Curried parameters and the Y* wrapper are bodies that are one lambda
+    # and nothing else; the name carries on into them. The lambda X itself
+    # is the scope of the definition, let(X). Other lambdas are called by
+    # their parameters.
+    bound = {}
+    scopes = set()  # Bodies of lambdas a gamma applies right away
+    for delta in deltas:
+        for i in range(len(delta) - 2):
+            if delta[i][0] not in (OP_GAMMA, OP_TAIL_GAMMA) or delta[i + 1][0] != OP_LAMBDA:
+                continue
+            scopes.add(delta[i + 1][1][0])
+            binder = delta[i + 1][1][2]
+            if binder.kind != ID:
+                continue
+            opcode, operand = delta[i + 2]
+            if opcode == OP_LAMBDA:
+                bound[operand[0]] = binder.getVal()
+            elif (opcode == OP_GAMMA and i + 4 < len(delta)
+                  and delta[i + 3][0] == OP_PUSH and delta[i + 3][1] is YSTAR_VALUE
+                  and delta[i + 4][0] == OP_LAMBDA):
+                bound[delta[i + 4][1][0]] = binder.getVal()
+
+    names = ["main"] + [None] * (len(deltas) - 1)
+    for index, delta in enumerate(deltas):
+        for opcode, operand in delta:
+            if opcode == OP_LAMBDA:
+                body = operand[0]
+                name = bound.get(body)
+                if name is None:
+                    if len(delta) == 1 and index in bound:
+                        name = bound[index]
+                        bound[body] = name  # On into further curried bodies
+                    elif body in scopes:
+                        name = "let(%s)" % ",".join(parameters(operand[2]))
+                    else:
+                        name = "lambda(%s)" % ",".join(parameters(operand[2]))
+                names[body] = "%s[%d]" % (name, body)
+    return names
+
+
+def parameters(boundVar):
+    if boundVar.kind == ID:
+        return [boundVar.getVal()]
+    names = []
+    child = boundVar.left if boundVar.kind == COMMA else None
+    while child is not None:
+        names.append(child.getVal())
+        child = child.right
+    return names
+
+
+class CallNode:
+    # A function in the calling context tree: one node for each chain of
+    # calls that led to it. A call of a function already on the chain goes
+    # back to that function's node, so recursion adds no depth and a node
+    # never has its own function below it.
+    __slots__ = ("function", "parent", "children", "chain", "calls", "steps", "time")
+
+    def __init__(self, function, parent):
+        self.function = function  # Delta index of the body
+        self.parent = parent
+        self.children = {}  # Function -> node of a call made from here
+        # Function -> node, for this node and the ones above it
+        self.chain = dict(parent.chain) if parent is not None else {}
+        self.chain[function] = self
+        self.calls = 0
+        self.steps = 0  # Instructions run in the function's own body
+        self.time = 0.0  # Seconds spent there
+
+    def call(self, function):
+        node = self.chain.get(function)
+        if node is None:
+            node = self.children.get(function)
+            if node is None:
+                node = self.children[function] = CallNode(function, self)
+        return node
+
+
+class ProfilingCSEMachine(CSEMachine):
+    # A CSE machine that records where its steps and time go. Each step is
+    # charged to the function whose body the current environment belongs
+    # to, and the time between two calls or returns to the function that
+    # ran in it. self.frames holds the call node of each environment on
+    # the environment stack. It also counts how many times each CSE rule
+    # was applied.
+    def __init__(self, deltas, tailCalls=True, out=None):
+        CSEMachine.__init__(self, deltas, tailCalls, out)
+        self.names = functionNames(deltas)
+        self.root = CallNode(0, None)
+        self.root.calls = 1
+        self.node = self.root  # Node of the function running
+        self.frames = [self.root]
+        self.clock = 0.0  # When self.node started running
+        self.opcodeCounts = [0] * len(OPCODE_NAMES)
+        self.applications = {}  # Rule name -> times applied
+
+    def loop(self):
+        control = self.control
+        handlers = self.handlers
+        counts = self.opcodeCounts
+        steps = 0
+        self.clock = time.perf_counter()
+        try:
+            while control:
+                opcode, operand = control.pop()
+                counts[opcode] += 1
+                self.node.steps += 1
+                handlers[opcode](operand)
+                steps += 1
+        finally:
+            self.steps += steps
+            self.switch(self.node)
+
+    def switch(self, node):
+        now = time.perf_counter()
+        self.node.time += now - self.clock
+        self.clock = now
+        self.node = node
+
+    def applied(self, rule):
+        self.applications[rule] = self.applications.get(rule, 0) + 1
+
+    def applyLambda(self):
+        closure = self.stack[-1]
+        self.applied(APPLY_TUPLE_LAMBDA if closure.arity > 1 else APPLY_LAMBDA)
+        # A tail call has already taken the caller's environment off the
+        # environment stack; its node goes too
+        frames = self.frames
+        del frames[len(self.getCurrEnvironment):]
+        node = frames[-1].call(closure.delta)
+        node.calls += 1
+        CSEMachine.applyLambda(self)
+        frames.append(node)
+        self.switch(node)
+
+    def exitEnvironment(self, env):
+        CSEMachine.exitEnvironment(self, env)
+        frames = self.frames
+        del frames[len(self.getCurrEnvironment):]
+        if frames and frames[-1] is not self.node:
+            self.switch(frames[-1])
+
+    def selectTuple(self):
+        self.applied(SELECT_TUPLE)
+        CSEMachine.selectTuple(self)
+
+    def applyYStar(self):
+        self.applied(APPLY_YSTAR)
+        CSEMachine.applyYStar(self)
+
+    def applyEta(self):
+        self.applied(APPLY_ETA)
+        CSEMachine.applyEta(self)
+
+    def applyBuiltin(self):
+        self.applied(APPLY_BUILTIN % self.stack[-1].name)
+        CSEMachine.applyBuiltin(self)
+
+    def nodes(self):
+        # Every call node, each before the nodes below it
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            yield node
+            pending.extend(node.children.values())
+
+    def report(self):
+        # A table of the functions, most steps first, then one of the rules
+        total = {}  # Node -> steps and time of it and everything below it
+        for node in reversed(list(self.nodes())):
+            steps, seconds = node.steps, node.time
+            for child in node.children.values():
+                steps += total[child][0]
+                seconds += total[child][1]
+            total[node] = (steps, seconds)
+
+        # A function is never below itself, so adding up its nodes counts
+        # nothing twice
+        functions = {}
+        for node in total:
+            row = functions.setdefault(node.function, [0, 0, 0, 0.0, 0.0])
+            row[0] += node.calls
+            row[1] += node.steps
+            row[2] += total[node][0]
+            row[3] += node.time
+            row[4] += total[node][1]
+
+        allSteps = max(self.steps, 1)
+        lines = [
+            "profile: %d steps in %.3f s" % (self.steps, total[self.root][1]),
+            "",
+            "%-28s %9s %12s %7s %12s %10s %10s" % (
+                "function", "calls", "self steps", "self %", "total steps", "self ms", "total ms"),
+        ]
+        for function, row in sorted(functions.items(), key=lambda item: (-item[1][1], item[0])):
+            lines.append("%-28s %9d %12d %6.1f%% %12d %10.1f %10.1f" % (
+                self.names[function], row[0], row[1], 100.0 * row[1] / allSteps, row[2],
+                row[3] * 1000, row[4] * 1000))
+
+        rules = dict(self.applications)
+        for opcode, count in enumerate(self.opcodeCounts):
+            name = RULE_NAMES.get(opcode)
+            if name is not None and count:
+                rules[name] = rules.get(name, 0) + count
+        lines.append("")
+        lines.append("%-42s %12s" % ("CSE rule", "times"))
+        for name, count in sorted(rules.items(), key=lambda item: (-item[1], item[0])):
+            lines.append("%-42s %12d" % (name, count))
+        return "\n".join(lines) + "\n"
+
+    def foldedStacks(self):
+        # One line per chain of calls that ran any step: the functions from
+        # main down, separated by semicolons, then the steps run in the
+        # last one. This is the input flamegraph.pl and similar tools take.
+        names = self.names
+        lines = []
+        pending = [(self.root, names[0])]
+        while pending:
+            node, path = pending.pop()
+            if node.steps:
+                lines.append("%s %d" % (path, node.steps))
+            for function, child in node.children.items():
+                pending.append((child, path + ";" + names[function]))
+        lines.sort()
+        return "\n".join(lines) + "\n"
@@ -1,11 +1,50 @@
+import re
+from symbols import SymbolTable
+
+# Token kind codes. Identifiers, literals and unknown operator runs share a
+# kind each; every keyword, punctuation mark and operator the grammar
+# names gets its own code so the parser never compares spellings.
+(
+    T_IDENTIFIER, T_INTEGER, T_STRING, T_OPERATOR, T_END,
+    T_LET, T_IN, T_FN, T_WHERE, T_AUG, T_WITHIN, T_REC, T_AND,
+    T_OR, T_NOT, T_EQ, T_NE, T_GR, T_GE, T_LS, T_LE,
+    T_TRUE, T_FALSE, T_NIL, T_DUMMY,
+    T_LPAREN, T_RPAREN, T_SEMICOLON, T_COMMA,
+    T_DOT, T_BAR, T_ARROW, T_AMPERSAND, T_AT, T_EQUALS,
+    T_PLUS, T_MINUS, T_STAR, T_SLASH, T_POWER,
+    T_GREATER, T_GREATER_EQ, T_LESS, T_LESS_EQ,
+) = range(44)
+
+FIXED_TOKENS = {
+    "let": T_LET, "in": T_IN, "fn": T_FN, "where": T_WHERE,
+    "aug": T_AUG, "within": T_WITHIN, "rec": T_REC, "and": T_AND,
+    "or": T_OR, "not": T_NOT, "eq": T_EQ, "ne": T_NE,
+    "gr": T_GR, "ge": T_GE, "ls": T_LS, "le": T_LE,
+    "true": T_TRUE, "false": T_FALSE, "nil": T_NIL, "dummy": T_DUMMY,
+    "(": T_LPAREN, ")": T_RPAREN, ";": T_SEMICOLON, ",": T_COMMA,
+    ".": T_DOT, "|": T_BAR, "->": T_ARROW, "&": T_AMPERSAND,
+    "@": T_AT, "=": T_EQUALS, "+": T_PLUS, "-": T_MINUS,
+    "*": T_STAR, "/": T_SLASH, "**": T_POWER,
+    ">": T_GREATER, ">=": T_GREATER_EQ, "<": T_LESS, "<=": T_LESS_EQ,
+}
+
+# Spelling of each fixed kind, for error messages
+TOKEN_NAMES = {kind: spelling for spelling, kind in FIXED_TOKENS.items()}
+TOKEN_NAMES.update({
+    T_IDENTIFIER: "<IDENTIFIER>", T_INTEGER: "<INTEGER>",
+    T_STRING: "<STRING>", T_OPERATOR: "<OPERATOR>", T_END: "<END>",
+})
+
+
 class Token:
-    def __init__(self, value, type):
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind, value):
+        self.kind = kind
         self.value = value
-        self.type = type
 
 
 class RPAL_Scanner:
-    punction = [")", "(", ";", ","]
     # List of operator symbols in RPAL
     operator_symbol = [
         "+","-","*","<",">",
@@ -16,163 +55,50 @@ class RPAL_Scanner:
         "?",
     ]
 
-    # List of reserved keywords in RPAL
-    RESERVED_KEYWORDS = [
-        "fn",
-        "where",
-        "let",
-        "aug",
-        "within",
-        "in",
-        "rec",
-        "eq",
-        "gr",
-        "ge",
-        "ls",
-        "le",
-        "ne",
-        "or",
-        "@",
-        "not",
-        "&",
-        "true",
-        "false",
-        "nil",
-        "dummy",
-        "and",
-        "|",
-    ]
-    # List of elements that can be part of comments
-    comment_elements = ['"', "\\", " ", "\t"]
-
-    def __init__(self, file):
+    # One alternative per lexical class. Whitespace and comments are matched
+    # so the scan can step over them, but they never become tokens. Characters
+    # that match no alternative are skipped by finditer.
+    TOKEN_PATTERN = re.compile(
+        r"(?P<SKIP>[ \t\n]+|//[^\n]*)"
+        r"|(?P<IDENTIFIER>[A-Za-z][A-Za-z0-9_]*)"
+        r"|(?P<INTEGER>[0-9]+)"
+        r"|'(?P<STRING>[^']*)'"
+        r"|(?P<PUNCTION>[();,])"
+        r"|(?P<OPERATOR>[" + re.escape("".join(operator_symbol)) + r"]+)"
+    )
+
+    def __init__(self, file, symbols=None):
         self.file = file
+        self.symbols = SymbolTable() if symbols is None else symbols
 
-    # Scannning
-    def Scanning(self):
-        Input_Tokens = []  # Temporary list to store all tokens including whitespace
+    def tokens(self):
+        # Read the file eagerly so a missing file is reported here, then hand
+        # back a generator the parser pulls tokens from one at a time
         with open(self.file, "r") as f:
             inputString = f.read()
+        return self.generateTokens(inputString)
 
-            i = 0
-            while i < len(inputString):
-                                                                # Case 1: Handle identifiers (variables and keywords)
-                if inputString[i].isalpha():
-                    temp = i        
-                    while i + 1 < len(inputString) and (        # Continue while we see letters, numbers, or underscores
-                        (inputString[i + 1].isalpha())
-                        or (inputString[i + 1].isdigit())
-                        or (inputString[i + 1] == "_")
-                    ):
-                        i += 1
-                    token = inputString[temp : i + 1]
-                    if token in RPAL_Scanner.RESERVED_KEYWORDS:
-                        Input_Tokens.append(Token(token, token))
-                    else:
-                        Input_Tokens.append(Token(token, "<IDENTIFIER>"))
-
-                elif inputString[i].isdigit():                  # Case 2: Handle integers   
-                    temp = i
-                    while i + 1 < len(inputString) and inputString[i + 1].isdigit():
-                        i += 1
-                    token = inputString[temp : i + 1]
-                    Input_Tokens.append(Token(token, "<INTEGER>"))
-
-                elif (                                          # Case 3: Handle whitespace (spaces, tabs, newlines)
-                    inputString[i] == " "
-                    or inputString[i] == "\t"
-                    or inputString[i] == "\n"
-                ):
-                    temp = i
-                    while i + 1 < len(inputString) and (
-                        inputString[i + 1] == " "
-                        or inputString[i + 1] == "\t"
-                        or inputString[i + 1] == "\n"
-                    ):
-                        i += 1
-                    token = inputString[temp : i + 1]
-                    Input_Tokens.append(Token(repr(token), "<DELETE>"))
-
-                elif inputString[i] == "(":                     # Case 4: Handle parentheses, semicolons, and commas
-                    token = "("
-                    Input_Tokens.append(Token("(", "("))
-
-                elif inputString[i] == ")":
-                    token = ")"
-                    Input_Tokens.append(Token(")", ")"))
-
-                elif inputString[i] == ";":
-                    token = ";"
-                    Input_Tokens.append(Token(";", ";"))
-
-                elif inputString[i] == ",":
-                    token = ","
-                    Input_Tokens.append(Token(",", ","))
-
-                elif inputString[i] == "'":                     # Case 5: Handle string literals
-                    temp = i
-                    while (
-                        i + 1 < len(inputString)
-                        and (
-                            inputString[i + 1] == "\t"
-                            or inputString[i + 1] == "\n"
-                            or inputString[i + 1] == "\\"
-                            or inputString[i + 1] == "("
-                            or inputString[i + 1] == ")"
-                            or inputString[i + 1] == ";"
-                            or inputString[i + 1] == ","
-                            or inputString[i + 1] == " "
-                            or inputString[i + 1].isalpha()
-                            or inputString[i + 1].isdigit()
-                            or inputString[i + 1] in RPAL_Scanner.operator_symbol
-                        )
-                        and inputString[i + 1] != "'"
-                    ):
-                        i += 1
-                    if i + 1 < len(inputString) and inputString[i + 1] == "'":
-                        i += 1
-                        token = inputString[temp + 1 : i]   #without ' ' marks
-                        Input_Tokens.append(Token(token, "<STRING>"))
-
-                elif (                                          # Case 6: Handle comments
-                    inputString[i] == "/"
-                    and (i + 1 < len(inputString))
-                    and inputString[i + 1] == "/"
-                ):
-                    temp = i
-                    while i + 1 < len(inputString) and (
-                        (inputString[i + 1] in RPAL_Scanner.comment_elements)
-                        or inputString[i + 1] in RPAL_Scanner.punction
-                        or inputString[i + 1].isalpha()
-                        or inputString[i + 1].isdigit()
-                        or inputString[i + 1] in RPAL_Scanner.operator_symbol
-                        and (not (inputString[i + 1] == "\n"))
-                    ):
-                        i += 1
-
-                    if i + 1 < len(inputString) and inputString[i + 1] == "\n":
-                        i += 1
-                        # token = inputString[temp : i + 1]   #with last newline
-                        token = inputString[temp:i]  # without newline
-                        Input_Tokens.append(Token(token, "<DELETE>"))
-
-
-                elif inputString[i] in RPAL_Scanner.operator_symbol:                # Case 7: Handle operators
-                    temp = i
-                    while (
-                        i + 1 < len(inputString) and inputString[i + 1] in RPAL_Scanner.operator_symbol
-                    ):
-                        i += 1
-                    token = inputString[temp : i + 1]
-                    Input_Tokens.append(Token(token, "<OPERATOR>"))
-
-                i += 1
-
-        # Remove whitespace tokens from Input_Tokens
-        Tokens = []
-
-        for token in Input_Tokens:
-            if token.type != "<DELETE>":
-                Tokens.append(token)
-
-        return Tokens
+    def generateTokens(self, inputString):
+        intern = self.symbols.intern
+        fixed = FIXED_TOKENS
+        for match in RPAL_Scanner.TOKEN_PATTERN.finditer(inputString):
+            group = match.lastgroup
+            if group == "SKIP":
+                continue
+            token = intern(match.group(group))
+
+            if group == "IDENTIFIER":                           # Identifiers and keywords
+                yield Token(fixed.get(token, T_IDENTIFIER), token)
+
+            elif group == "INTEGER":                            # Integers
+                yield Token(T_INTEGER, token)
+
+            elif group == "STRING":                             # String literals without ' ' marks
+                yield Token(T_STRING, token)
+
+            else:                                               # Punctuation and operators
+                yield Token(fixed.get(token, T_OPERATOR), token)
+
+    # Scannning
+    def Scanning(self):
+        return list(self.tokens())
@@ -0,0 +1,30 @@
+class SymbolTable:
+    # Interns identifier, keyword and literal spellings. Each distinct
+    # spelling is stored once and given a small integer id, so tokens and
+    # nodes that name the same thing share one string object.
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids = {}  # spelling -> id
+        self.names = []  # id -> spelling
+
+    def intern(self, text):
+        # Return the table's copy of text, adding it if it is new
+        id = self.ids.get(text)
+        if id is None:
+            id = len(self.names)
+            self.ids[text] = id
+            self.names.append(text)
+        return self.names[id]
+
+    def internId(self, text):
+        # Like intern, but return the spelling's id
+        id = self.ids.get(text)
+        if id is None:
+            id = len(self.names)
+            self.ids[text] = id
+            self.names.append(text)
+        return id
+
+    def __len__(self):
+        return len(self.names)
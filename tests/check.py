@@ -0,0 +1,71 @@
+# Runs the test programs and compares what they print with the expected
+# output kept in tests/expected.
+# Usage: python3 tests/check.py [test_name ...]
+#
+# tests/expected/NAME.MODE holds what myrpal.py prints for tests/NAME.rpal
+# run in that mode, standard output followed by standard error:
+#   out      no flags
+#   opt      -opt, the optimized standardized tree
+#   report   -report, what the optimizer removed
+#   memo     --memo, whose hit and miss counts go to standard error
+#   noopt    --no-opt, run without the optimizer
+# A test can have any of these; the modes of the files present are run.
+# Every run uses --no-cache, so what is checked is what the compiler
+# makes of the program now, not control structures cached earlier.
+
+import difflib
+import os
+import subprocess
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPECTED_DIR = os.path.join(TEST_DIR, "expected")
+COMPILER = os.path.join(TEST_DIR, "..", "myrpal.py")
+
+MODE_FLAGS = {
+    "out": [],
+    "opt": ["-opt"],
+    "report": ["-report"],
+    "memo": ["--memo"],
+    "noopt": ["--no-opt"],
+}
+
+
+def run(name, mode):
+    result = subprocess.run(
+        [sys.executable, COMPILER, "--no-cache"] + MODE_FLAGS[mode] + [os.path.join(TEST_DIR, name + ".rpal")],
+        capture_output=True, text=True, timeout=300)
+    return result.stdout + result.stderr
+
+
+def expectedFiles(names):
+    # (test name, mode, expected output file) for every expected file, or
+    # only those of the tests named
+    for fileName in sorted(os.listdir(EXPECTED_DIR)):
+        name, _, mode = fileName.rpartition(".")
+        if mode not in MODE_FLAGS or (names and name not in names):
+            continue
+        yield name, mode, os.path.join(EXPECTED_DIR, fileName)
+
+
+def main():
+    names = set(sys.argv[1:])
+    passed = failed = 0
+    for name, mode, path in expectedFiles(names):
+        with open(path, encoding="utf-8") as file:
+            expected = file.read()
+        actual = run(name, mode)
+        if actual == expected:
+            passed += 1
+            continue
+        failed += 1
+        print("FAIL %s (%s)" % (name, mode))
+        sys.stdout.writelines(difflib.unified_diff(
+            expected.splitlines(True), actual.splitlines(True), "expected", "actual"))
+        print()
+    print("%d passed, %d failed" % (passed, failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
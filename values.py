@@ -0,0 +1,218 @@
+from ASTNode import *
+from instructions import BUILTIN_FUNCTIONS
+
+# Runtime values of the CSE machine. Integers, truth values and strings are
+# plain Python int, bool and str; everything else is one of the classes
+# below. Long strings made by Stern and Conc may also be a StringView or a
+# Rope, which stand for the str they would have made. nil, dummy and Y*
+# each have a single shared instance, like True and False, so they are
+# compared with `is`. Since bool is a subclass of int, type tests use
+# `type(value) is int` rather than isinstance.
+
+
+class Nil:
+    __slots__ = ()
+
+
+class Dummy:
+    __slots__ = ()
+
+
+class YStar:
+    __slots__ = ()
+
+
+NIL_VALUE = Nil()
+DUMMY_VALUE = Dummy()
+YSTAR_VALUE = YStar()
+
+
+class Closure:
+    # A lambda together with the environment it was created in
+    __slots__ = ("delta", "arity", "boundVar", "env", "recursive")
+
+    def __init__(self, delta, arity, boundVar, env, recursive=False):
+        self.delta = delta  # Index of the body's delta
+        self.arity = arity  # Slots the call binds, as in the OP_LAMBDA operand
+        self.boundVar = boundVar  # ASTNode: an ID, a comma of IDs, or ()
+        self.env = env
+        # Made by Y* from a rec definition; env binds the closure itself.
+        # It stands for the eta CSE Rule 12 would have made, and prints
+        # as one.
+        self.recursive = recursive
+
+
+class Eta:
+    # What Y* makes of a closure: applying it applies the closure to the
+    # eta itself, then the result to the argument (CSE Rule 13)
+    __slots__ = ("closure",)
+
+    def __init__(self, closure):
+        self.closure = closure
+
+
+class Tuple:
+    # A tuple never changes once made, but tuples grown by aug share one
+    # list: each sees the first `length` items of it. aug appends to the
+    # list in place when its tuple is the longest one on it and copies
+    # otherwise, so growing a tuple one element at a time costs amortized
+    # O(1) per element and no tuple ever sees another's additions.
+    __slots__ = ("items", "length")
+
+    def __init__(self, items):
+        self.items = items  # List of values, possibly longer than the tuple
+        self.length = len(items)
+
+    def get(self, index):
+        # Element index, counting from 1 as RPAL does
+        if type(index) is not int:
+            raise TypeError("tuple index must be an integer")
+        if not 1 <= index <= self.length:
+            raise IndexError("tuple index %d out of range" % index)
+        return self.items[index - 1]
+
+    def elements(self):
+        items = self.items
+        return items if len(items) == self.length else items[:self.length]
+
+    def aug(self, value):
+        items = self.items
+        if len(items) != self.length:  # A longer tuple already shares it
+            items = items[:self.length]
+        items.append(value)
+        result = Tuple.__new__(Tuple)
+        result.items = items
+        result.length = self.length + 1
+        return result
+
+
+class StringView:
+    # What Stern makes of a long string: the string from `start` on,
+    # without copying it. Stern of a view is a view one further along, so
+    # walking a string with Stem and Stern costs O(1) per character.
+    __slots__ = ("base", "start")
+
+    def __init__(self, base, start):
+        self.base = base  # A str
+        self.start = start
+
+
+class Rope:
+    # What Conc makes of two strings whose total length is long: the two
+    # strings, kept apart until something needs the characters. Building a
+    # string one Conc at a time, at either end, then costs O(1) per Conc,
+    # and flatString joins all the pieces once.
+    __slots__ = ("left", "right", "length", "flat")
+
+    def __init__(self, left, right):
+        self.left = left  # Any string value
+        self.right = right
+        self.length = stringLength(left) + stringLength(right)
+        self.flat = None  # The str, once flatString has made it
+
+
+STRING_TYPES = (str, StringView, Rope)
+
+# Strings up to this length are made as plain str: copying them costs
+# about as much as a view or a rope node would
+SHORT_STRING = 64
+
+
+def stringLength(value):
+    kind = type(value)
+    if kind is str:
+        return len(value)
+    if kind is StringView:
+        return len(value.base) - value.start
+    return value.length
+
+
+def flatString(value):
+    # The str a string value stands for. A rope joins its pieces with a
+    # stack rather than by recursion, as ropes built one Conc at a time
+    # are as deep as they are long, and keeps the result in place of them.
+    kind = type(value)
+    if kind is str:
+        return value
+    if kind is StringView:
+        return value.base[value.start:]
+    if value.flat is not None:
+        return value.flat
+
+    pieces = []
+    pending = [value]
+    while pending:
+        piece = pending.pop()
+        kind = type(piece)
+        if kind is str:
+            pieces.append(piece)
+        elif kind is StringView:
+            pieces.append(piece.base[piece.start:])
+        elif piece.flat is not None:
+            pieces.append(piece.flat)
+        else:
+            pending.append(piece.right)
+            pending.append(piece.left)
+
+    value.flat = "".join(pieces)
+    value.left = value.right = None
+    return value.flat
+
+
+class Builtin:
+    # A built-in function, with the arguments it has been given so far
+    __slots__ = ("code", "name", "args")
+
+    def __init__(self, code, args=()):
+        self.code = code  # Index into the machine's table of built-ins
+        self.name = BUILTIN_FUNCTIONS[code]
+        self.args = args
+
+
+# The built-in functions before any argument, one shared value each
+BUILTIN_VALUES = {name: Builtin(code) for code, name in enumerate(BUILTIN_FUNCTIONS)}
+
+
+FUNCTION_TYPES = (Closure, Eta, Builtin)
+
+
+def constantValue(kind, text):
+    # The runtime value of a literal node
+    if kind == INT:
+        return int(text)
+    if kind == STR:
+        return text
+    if kind == TRUE:
+        return True
+    if kind == FALSE:
+        return False
+    if kind == NIL:
+        return NIL_VALUE
+    if kind == DUMMY:
+        return DUMMY_VALUE
+    if kind == YSTAR:
+        return YSTAR_VALUE
+    if kind == ID:
+        return BUILTIN_VALUES[text]
+    raise ValueError("not a constant kind: %d" % kind)
+
+
+def constantNode(value):
+    # The kind and spelling of a value constantValue can make
+    if value is True:
+        return TRUE, "true"
+    if value is False:
+        return FALSE, "false"
+    if type(value) is int:
+        return INT, str(value)
+    if type(value) is str:
+        return STR, value
+    if value is NIL_VALUE:
+        return NIL, "nil"
+    if value is DUMMY_VALUE:
+        return DUMMY, "dummy"
+    if value is YSTAR_VALUE:
+        return YSTAR, "Y*"
+    if type(value) is Builtin and not value.args:
+        return ID, value.name
+    raise ValueError("not a constant: %r" % (value,))